@@ -1,16 +1,20 @@
+-- Single schema definition: run whole by MySQL's docker-entrypoint-initdb.d (fresh volumes only);
+-- database_manager.initialize_db() runs only the CREATE statements, never the site seed below
 CREATE TABLE IF NOT EXISTS news_sites (
     id INT AUTO_INCREMENT PRIMARY KEY,
     domain VARCHAR(255) NOT NULL UNIQUE,
     start_url VARCHAR(255) NOT NULL,
     last_visited DATETIME NULL,
     active TINYINT(1) DEFAULT 1,
-    priority INT DEFAULT 10
+    priority INT DEFAULT 10,
+    avg_crawl_seconds FLOAT NULL -- EWMA of crawl durations, used by the runner's scheduler
 );
 
 CREATE TABLE IF NOT EXISTS articles (
     id INT PRIMARY KEY AUTO_INCREMENT,
     site_id INT NOT NULL,
-    url VARCHAR(500),
+    url TEXT NOT NULL,
+    url_hash BINARY(16) NOT NULL, -- UNHEX(MD5(url)): fixed-width key for every lookup and upsert
     title TEXT,
     body LONGTEXT,
     image_url TEXT,
@@ -18,7 +22,9 @@ CREATE TABLE IF NOT EXISTS articles (
     scraped_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     last_cited_date DATETIME,
     FOREIGN KEY(site_id) REFERENCES news_sites(id),
-    UNIQUE KEY unique_url_idx (url(255))
+    UNIQUE KEY unique_url_hash_idx (url_hash),
+    KEY site_scraped_idx (site_id, scraped_at),
+    KEY content_hash_idx (content_hash)
 ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
 
 -- 3. Εισαγωγή των 21 πηγών
@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import regex
+
+# Boilerplate removal for extracted article bodies: the per-domain rules of
+# config/boilerplate_rules.json plus a filter that drops lines with generic phrases.
+# Rules run on the `regex` module so the passes over a body can share one time budget.
+#
+#   python boilerplate.py bench      time every rule against the saved corpora in data/store
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RULES_FILE = os.path.join(BASE_DIR, "config", "boilerplate_rules.json")
+STORE_DIR = os.path.join(BASE_DIR, "data", "store")
+
+GENERIC_PHRASES = ['Ακολουθήστε μας', 'Follow us', 'Διαβάστε ακόμη']
+
+# Same semantics as the former re.IGNORECASE | re.DOTALL rules (V0 = re-compatible behaviour)
+RULE_FLAGS = regex.IGNORECASE | regex.DOTALL | regex.V0
+
+# Seconds of matching allowed per body, shared by all of its passes (combined and single rules)
+DEFAULT_TIMEOUT = 0.05
+
+# Numbered / named backreferences stop being valid once patterns are merged into one alternation
+BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=|\\g<')
+
+
+def compile_phrases(phrases: List[str]):
+    return regex.compile('|'.join(regex.escape(p) for p in phrases)) if phrases else None
+
+
+def drop_lines(text: str, phrase_re) -> str:
+    """Removes every line containing one of the phrases, in a single scan over the text."""
+    if phrase_re is None:
+        return text
+    kept, pos = [], 0
+    match = phrase_re.search(text)
+    while match:
+        start = text.rfind('\n', 0, match.start()) + 1
+        end = text.find('\n', match.end())
+        end = len(text) if end == -1 else end + 1
+        kept.append(text[pos:start])
+        pos = end
+        match = phrase_re.search(text, pos)
+    kept.append(text[pos:])
+    return ''.join(kept)
+
+
+class DomainRules:
+    """
+    Rules of one domain, merged into a single alternation when possible so the body is
+    scanned once. The individual patterns are kept for the fallback path.
+    """
+
+    def __init__(self, domain: str, patterns: List[str]):
+        self.domain = domain
+        self.sources: List[str] = []
+        self.patterns = []
+        for source in patterns:
+            if not isinstance(source, str):
+                continue
+            try:
+                self.patterns.append(regex.compile(source, RULE_FLAGS))
+                self.sources.append(source)
+            except regex.error as e:
+                sys.stderr.write(f"Warning: skipping invalid boilerplate rule for {domain}: {source!r} ({e})\n")
+        self.combined = self._combine()
+
+    def _combine(self):
+        if len(self.patterns) < 2 or any(BACKREFERENCE.search(s) for s in self.sources):
+            return None
+        try:
+            return regex.compile('|'.join(f'(?:{s})' for s in self.sources), RULE_FLAGS)
+        except regex.error:
+            return None
+
+    def apply(self, text: str, timeout: Optional[float]) -> Tuple[str, int]:
+        """
+        Returns the cleaned text and the number of passes that ran out of time. timeout is the
+        budget of the whole body: the combined pass gets half of it, and if it runs out the rules
+        split what is left, each getting an equal share of the time remaining when it starts
+        (so the time a cheap rule leaves unused goes to the rules after it).
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        timeouts = 0
+        if self.combined is not None:
+            try:
+                return self.combined.sub('', text, timeout=timeout / 2 if timeout else None), 0
+            except TimeoutError:
+                timeouts += 1
+        # one pass per rule; a rule that runs out of time leaves the text unchanged
+        for i, pattern in enumerate(self.patterns):
+            share = None
+            if deadline is not None:
+                share = (deadline - time.monotonic()) / (len(self.patterns) - i)
+                if share <= 0:
+                    return text, timeouts + len(self.patterns) - i
+            try:
+                text = pattern.sub('', text, timeout=share)
+            except TimeoutError:
+                timeouts += 1
+        return text, timeouts
+
+
+class BoilerplateEngine:
+    def __init__(self, rules: Dict[str, List[str]], phrases: List[str] = GENERIC_PHRASES,
+                 timeout: Optional[float] = DEFAULT_TIMEOUT):
+        self.domains = {domain: DomainRules(domain, patterns) for domain, patterns in rules.items()}
+        self.phrase_re = compile_phrases(phrases)
+        self.timeout = timeout or None
+
+    @classmethod
+    def from_file(cls, rules_file: str = RULES_FILE, timeout: Optional[float] = DEFAULT_TIMEOUT):
+        return cls(load_rules(rules_file), timeout=timeout)
+
+    def clean(self, text: str, domain: str) -> Tuple[str, int]:
+        """Domain rules, then lines with generic boilerplate phrases removed."""
+        timeouts = 0
+        rules = self.domains.get(domain)
+        if rules is not None:
+            text, timeouts = rules.apply(text, self.timeout)
+        return drop_lines(text, self.phrase_re).strip(), timeouts
+
+
+def load_rules(rules_file: str) -> Dict[str, List[str]]:
+    #loads the raw Regex rules per domain from the JSON configuration file
+    rules = {}
+    try:
+        if not os.path.exists(rules_file):
+            return rules
+        with open(rules_file, 'r', encoding='utf-8') as f:
+            rules_list = json.load(f)
+        for rule in rules_list:
+            domain = rule.get('domain')
+            patterns = rule.get('patterns')
+            if domain and patterns and isinstance(patterns, list):
+                rules[domain] = patterns
+        return rules
+    except Exception as e:
+        sys.stderr.write(f"️ Warnings: Error loading rules from {rules_file}: {e}\n")
+        return {}
+
+
+# --- bench ---
+
+def load_corpus(data_dir: str) -> List[Tuple[str, str]]:
+    try:
+        from .dataset_store import load_records
+    except ImportError:
+        from dataset_store import load_records
+    corpus = []
+    for record in load_records(data_dir, ["url", "article_body"]):
+        body = record.get('article_body')
+        if isinstance(body, str) and body:
+            corpus.append((urlparse(record.get('url', '')).netloc.replace('www.', ''), body))
+    return corpus
+
+
+def legacy_clean(text: str, patterns, phrases: List[str]) -> str:
+    # previous implementation: one re.sub per rule, then a substring test per line and phrase
+    for pattern in patterns:
+        text = pattern.sub('', text)
+    return "\n".join([l for l in text.split('\n') if not any(x in l for x in phrases)]).strip()
+
+
+def bench(args):
+    rules = load_rules(args.rules)
+    corpus = load_corpus(args.data)
+    if args.repeat > 1:
+        corpus = [(domain, "\n".join([body] * args.repeat)) for domain, body in corpus]
+    if not corpus:
+        sys.stderr.write(f"Error: no article bodies found in {args.data}\n")
+        return 1
+    print(f"{len(corpus)} bodies, {sum(len(b) for _, b in corpus) / len(corpus):.0f} chars on average, "
+          f"{sum(len(p) for p in rules.values())} rules for {len(rules)} domains")
+
+    # Every rule against every body: the corpus of one site rarely triggers the worst case
+    print(f"\n{'domain':<18} {'total ms':>9} {'max ms':>8} {'timeouts':>8}  pattern")
+    slow = 0
+    for domain, sources in rules.items():
+        for source in sources:
+            try:
+                pattern = regex.compile(source, RULE_FLAGS)
+            except regex.error as e:
+                print(f"{domain:<18} {'-':>9} {'-':>8} {'-':>8}  {source}  INVALID ({e})")
+                continue
+            total, worst, timeouts = 0.0, 0.0, 0
+            for _, body in corpus:
+                started = time.perf_counter()
+                try:
+                    pattern.sub('', body, timeout=args.timeout)
+                except TimeoutError:
+                    timeouts += 1
+                elapsed = time.perf_counter() - started
+                total += elapsed
+                worst = max(worst, elapsed)
+            flag = "  SLOW" if timeouts or worst * 1000 > args.slow_ms else ""
+            slow += bool(flag)
+            print(f"{domain:<18} {total * 1000:>9.1f} {worst * 1000:>8.2f} {timeouts:>8}  {source}{flag}")
+
+    # Engine against the previous per-rule / per-line implementation, each body with its own domain rules
+    engine = BoilerplateEngine(rules, timeout=args.timeout)
+    legacy_rules = {d: [re.compile(p, re.IGNORECASE | re.DOTALL) for p in s] for d, s in rules.items()}
+    legacy_seconds, engine_seconds, mismatches, timeouts = 0.0, 0.0, 0, 0
+    for domain, body in corpus:
+        started = time.perf_counter()
+        expected = legacy_clean(body, legacy_rules.get(domain, []), GENERIC_PHRASES)
+        legacy_seconds += time.perf_counter() - started
+        started = time.perf_counter()
+        cleaned, body_timeouts = engine.clean(body, domain)
+        engine_seconds += time.perf_counter() - started
+        timeouts += body_timeouts
+        mismatches += cleaned != expected
+    print(f"\nlegacy: {legacy_seconds * 1000:.1f} ms, engine: {engine_seconds * 1000:.1f} ms, "
+          f"outputs differing: {mismatches}, timed out passes: {timeouts}, slow rules: {slow}")
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Boilerplate rule engine tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench_parser = sub.add_parser("bench", help="time every rule against the saved corpora")
+    bench_parser.add_argument("--rules", default=RULES_FILE, help="rules file (default: config/boilerplate_rules.json)")
+    bench_parser.add_argument("--data", default=STORE_DIR, help="dataset store, or a directory of saved page JSON files")
+    bench_parser.add_argument("--slow-ms", type=float, default=5.0,
+                              help="flag rules taking longer than this on a single body")
+    bench_parser.add_argument("--timeout", type=float, default=1.0, help="per-body timeout in seconds")
+    bench_parser.add_argument("--repeat", type=int, default=1,
+                              help="concatenate every body N times to simulate long pages")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "bench":
+        sys.exit(bench(args))
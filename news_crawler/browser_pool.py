@@ -0,0 +1,179 @@
+import os
+from collections import defaultdict
+from typing import Dict, List, Any, Optional
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def browser_rss_bytes(root_pid: int = None) -> int:
+    """
+    Resident memory of all processes spawned by this crawler (Playwright driver and Chromium).
+    Reads /proc directly, so it returns 0 on systems without procfs.
+    """
+    root_pid = root_pid or os.getpid()
+    children = defaultdict(list)
+    try:
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat', 'r') as f:
+                    stat = f.read()
+                # the process name may contain spaces, ppid is the 2nd field after ')'
+                ppid = int(stat.rsplit(')', 1)[1].split()[1])
+                children[ppid].append(int(entry))
+            except (OSError, ValueError, IndexError):
+                continue
+    except OSError:
+        return 0
+
+    total, stack = 0, list(children.get(root_pid, []))
+    while stack:
+        pid = stack.pop()
+        stack.extend(children.get(pid, []))
+        try:
+            with open(f'/proc/{pid}/statm', 'r') as f:
+                total += int(f.read().split()[1]) * PAGE_SIZE
+        except (OSError, ValueError, IndexError):
+            continue
+    return total
+
+
+class BrowserPool:
+    """
+    Keeps Playwright pages warm and hands them to new requests instead of opening a page per request.
+    All pooled requests run in one named context which is recycled after serving a number of pages
+    or when the browser processes grow past an RSS limit.
+    """
+
+    def __init__(self, max_idle_pages: int = 4, context_max_pages: int = 200, rss_limit_mb: int = 1500,
+                 rss_check_interval: int = 20, context_kwargs: Dict[str, Any] = None, stats=None):
+        self.max_idle_pages = max_idle_pages
+        self.context_max_pages = context_max_pages
+        self.rss_limit_bytes = rss_limit_mb * 1048576
+        self.rss_check_interval = max(1, rss_check_interval)
+        self.context_kwargs = context_kwargs or {}
+        self.stats = stats
+
+        self.generation = 0
+        self.context_name = self._name(0)
+        self.served = 0
+        self.idle: List[Any] = []
+        self.outstanding: Dict[str, int] = defaultdict(int)
+        self.contexts: Dict[str, Any] = {}
+        self.retiring = set()
+        self.hits = 0
+        self.misses = 0
+        self.recycled = 0
+        self.rss_peak = 0
+        self.last_rss = 0
+
+    @staticmethod
+    def _name(generation: int) -> str:
+        return f"pool-{generation}"
+
+    def _inc(self, key, count=1):
+        if self.stats:
+            self.stats.inc_value(f"browser_pool/{key}", count)
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    async def acquire(self, request):
+        """Routes a Playwright request to the pool context, reusing an idle page when available."""
+        recycle_reason = self._recycle_reason()
+        if recycle_reason:
+            await self._rotate(recycle_reason)
+
+        meta = request.meta
+        meta["playwright_context"] = self.context_name
+        meta.setdefault("playwright_context_kwargs", self.context_kwargs)
+        meta["playwright_include_page"] = True
+        meta["browser_pool_context"] = self.context_name
+
+        page = None
+        while self.idle and page is None:
+            candidate = self.idle.pop()
+            if not candidate.is_closed():
+                page = candidate
+        if page is not None:
+            meta["playwright_page"] = page
+            self.hits += 1
+            self._inc("hits")
+        else:
+            meta.pop("playwright_page", None)
+            self.misses += 1
+            self._inc("misses")
+
+        self.served += 1
+        self.outstanding[self.context_name] += 1
+
+    async def release(self, request, reusable: bool = True):
+        """Returns the page of a finished request to the pool (or closes it)."""
+        context_name = request.meta.pop("browser_pool_context", None)
+        page = request.meta.pop("playwright_page", None)
+        if context_name is None:
+            return
+        self.outstanding[context_name] -= 1
+
+        if page is not None and not page.is_closed():
+            self.contexts.setdefault(context_name, page.context)
+            if reusable and context_name == self.context_name and len(self.idle) < self.max_idle_pages:
+                self.idle.append(page)
+            else:
+                await page.close()
+
+        if context_name in self.retiring and self.outstanding[context_name] <= 0:
+            await self._close_context(context_name)
+
+    def _recycle_reason(self) -> Optional[str]:
+        if self.context_max_pages and self.served >= self.context_max_pages:
+            return "pages"
+        if self.rss_limit_bytes and self.served and self.served % self.rss_check_interval == 0:
+            self.last_rss = browser_rss_bytes()
+            self.rss_peak = max(self.rss_peak, self.last_rss)
+            if self.last_rss > self.rss_limit_bytes:
+                return "rss"
+        return None
+
+    async def _rotate(self, reason: str):
+        # Switches new requests to a fresh context; the old one closes once its pages come back.
+        # State is swapped before any await so concurrent acquires never rotate twice.
+        old_name, idle_pages = self.context_name, self.idle
+        self.idle = []
+        self.generation += 1
+        self.context_name = self._name(self.generation)
+        self.served = 0
+        self.recycled += 1
+        self.retiring.add(old_name)
+        self._inc("contexts_recycled")
+        self._inc(f"contexts_recycled/{reason}")
+
+        for page in idle_pages:
+            if not page.is_closed():
+                await page.close()
+        if self.outstanding[old_name] <= 0:
+            await self._close_context(old_name)
+
+    async def _close_context(self, context_name: str):
+        self.retiring.discard(context_name)
+        self.outstanding.pop(context_name, None)
+        context = self.contexts.pop(context_name, None)
+        if context is not None:
+            try:
+                await context.close()
+            except Exception:
+                pass
+
+    def report(self) -> Dict[str, Any]:
+        self.last_rss = browser_rss_bytes()
+        self.rss_peak = max(self.rss_peak, self.last_rss)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate(), 3),
+            "contexts_recycled": self.recycled,
+            "rss_mb": round(self.last_rss / 1048576, 1),
+            "rss_peak_mb": round(self.rss_peak / 1048576, 1),
+        }
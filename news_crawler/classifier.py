@@ -0,0 +1,125 @@
+import os
+import re
+import sys
+from typing import Dict, List, Any, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# Imported as news_crawler.classifier by the pipelines and as a top-level module by the spider and scripts
+try:
+    from .compact_forest import COMPACT_DIR, CompactForest
+    from .features import build_features
+except ImportError:
+    from compact_forest import COMPACT_DIR, CompactForest
+    from features import build_features
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+
+# Pre-fetch link scorer (scripts/train_classifier.py --url-model): features computable from the
+# link URL alone, before the page is requested
+URL_FEATURES = [
+    "url_length", "url_depth", "has_date_pattern_in_url", "has_numeric_id",
+    "last_segment_length", "last_segment_hyphens", "is_category_keyword"
+]
+URL_MODEL_FILE = "url_classifier.pkl"
+URL_POSITIVE_LABEL = "article"
+
+DATE_IN_URL = re.compile(r"/\d{4}/\d{2}/\d{2}/")
+NUMERIC_ID_IN_URL = re.compile(r"/\d{5,}(?=/)")
+
+# One loaded model per models directory and process
+_LOADED_CLASSIFIERS: Dict[str, "LinkClassifier"] = {}
+_LOADED_URL_CLASSIFIERS: Dict[str, Optional["URLClassifier"]] = {}
+
+
+class LinkClassifier:
+    """
+    The Random Forest page classifier (article / category / other). Loads the compact export
+    (models/link_classifier/, see compact_forest) when present, the sklearn pickles with their label
+    encoder otherwise. Use LinkClassifier.load() so the model is read only once per process.
+    """
+
+    def __init__(self, model, encoder=None):
+        self.model = model
+        self.encoder = encoder
+
+    @classmethod
+    def load(cls, models_dir: str = MODELS_DIR) -> "LinkClassifier":
+        if models_dir not in _LOADED_CLASSIFIERS:
+            compact_dir = os.path.join(models_dir, COMPACT_DIR)
+            if CompactForest.exists(compact_dir):
+                _LOADED_CLASSIFIERS[models_dir] = cls(CompactForest.load(compact_dir))
+            else:
+                model = joblib.load(os.path.join(models_dir, "link_classifier.pkl"))
+                encoder = joblib.load(os.path.join(models_dir, "label_encoder.pkl"))
+                _LOADED_CLASSIFIERS[models_dir] = cls(model, encoder)
+        return _LOADED_CLASSIFIERS[models_dir]
+
+    def predict_features(self, X: pd.DataFrame) -> List[str]:
+        """Labels for a REQUIRED_FEATURES frame from features.build_features."""
+        if isinstance(self.model, CompactForest):
+            return self.model.predict(X.to_numpy())
+        return list(self.encoder.inverse_transform(self.model.predict(X)))
+
+    def predict_frame(self, df: pd.DataFrame) -> List[str]:
+        """Labels for a frame of crawled records."""
+        return self.predict_features(build_features(df))
+
+    def predict_records(self, records: List[Dict[str, Any]]) -> List[str]:
+        """Labels for crawled items."""
+        return self.predict_frame(pd.DataFrame(records))
+
+
+def url_features(url: str, category_matcher=None) -> List[float]:
+    """URL_FEATURES of a link, on the URL as the spider requests it (no query, fragment or trailing slash)."""
+    url = url.split('#')[0].split('?')[0].rstrip('/')
+    path = url.split('://', 1)[-1].partition('/')[2]
+    last_segment = path.rsplit('/', 1)[-1]
+    return [
+        len(url),
+        url.count('/'),
+        1 if DATE_IN_URL.search(url + '/') else 0,
+        1 if NUMERIC_ID_IN_URL.search('/' + path + '/') else 0,
+        len(last_segment),
+        last_segment.count('-'),
+        1 if category_matcher is not None and category_matcher.match(url.lower()) else 0,
+    ]
+
+
+class URLClassifier:
+    """
+    Scores links by the probability that they lead to an article, from URL_FEATURES only.
+    Links scoring below threshold (picked at training time for a target article recall)
+    are not worth fetching. Use URLClassifier.load(); it returns None if no model was trained.
+    """
+
+    def __init__(self, model, threshold: float, features: List[str] = URL_FEATURES, recall: float = None):
+        self.model = model
+        self.threshold = threshold
+        self.features = features
+        self.recall = recall
+        self.positive_index = list(model.classes_).index(1)
+
+    @classmethod
+    def load(cls, models_dir: str = MODELS_DIR) -> Optional["URLClassifier"]:
+        if models_dir not in _LOADED_URL_CLASSIFIERS:
+            path = os.path.join(models_dir, URL_MODEL_FILE)
+            classifier = None
+            if os.path.exists(path):
+                saved = joblib.load(path)
+                if saved.get("features") == URL_FEATURES:
+                    classifier = cls(saved["model"], saved["threshold"], saved["features"], saved.get("recall"))
+                else:
+                    sys.stderr.write(f"Warning: {path} was trained on other features, retrain it with --url-model\n")
+            _LOADED_URL_CLASSIFIERS[models_dir] = classifier
+        return _LOADED_URL_CLASSIFIERS[models_dir]
+
+    def score(self, urls: List[str], category_matcher=None) -> np.ndarray:
+        """Article probability of every URL, in one batch."""
+        if not urls:
+            return np.empty(0)
+        X = np.array([url_features(u, category_matcher) for u in urls], dtype=float)
+        return self.model.predict_proba(X)[:, self.positive_index]
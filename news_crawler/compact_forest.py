@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List, Sequence
+
+import numpy as np
+
+# The page classifier's Random Forest flattened into contiguous arrays (one .npy per field plus
+# meta.json), written by scripts/train_classifier.py next to the pickles. Loading memory-maps the
+# arrays, so a predictor subprocess starts in milliseconds without importing sklearn, and a batch
+# is predicted by walking every tree for every row at once.
+#
+#   python compact_forest.py export    flatten the current models/link_classifier.pkl
+#   python compact_forest.py bench     load time and latency per 1k pages vs. sklearn
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+STORE_DIR = os.path.join(BASE_DIR, "data", "store")
+COMPACT_DIR = "link_classifier"
+FORMAT_VERSION = 1
+
+ARRAYS = ("feature", "threshold", "children", "value", "roots")
+# (row, tree) pairs that reached a leaf are dropped from the working set every few levels
+COMPACT_EVERY = 3
+# Rows traversed together; larger working sets fall out of cache
+BATCH_ROWS = 512
+
+
+def _floor_float32(values: np.ndarray) -> np.ndarray:
+    """
+    Largest float32 <= each value. sklearn compares float32 inputs against float64 thresholds;
+    for a float32 x, x <= t exactly when x <= floor32(t), so predictions stay identical.
+    """
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def export_forest(model, classes: Sequence[str], features: Sequence[str], directory: str) -> str:
+    """
+    Writes a fitted RandomForestClassifier as flat arrays. Node ids are global across trees;
+    children holds the (left, right) pair of every node; leaves point to themselves with an
+    infinite threshold, so traversal needs no leaf test.
+    classes are the label names in the order of model.classes_.
+    """
+    feature, threshold, children, value, roots = [], [], [], [], []
+    offset, max_depth = 0, 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        ids = np.arange(tree.node_count) + offset
+        leaf = tree.children_left < 0
+        feature.append(np.where(leaf, 0, tree.feature))
+        threshold.append(np.where(leaf, np.inf, tree.threshold))
+        children.append(np.stack([np.where(leaf, ids, tree.children_left + offset),
+                                  np.where(leaf, ids, tree.children_right + offset)], axis=1))
+        counts = tree.value[:, 0, :]
+        value.append(counts / counts.sum(axis=1, keepdims=True))   # per-tree class probabilities
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    arrays = {
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": _floor_float32(np.concatenate(threshold)),
+        "children": np.concatenate(children).astype(np.int32),
+        "value": np.concatenate(value).astype(np.float32),
+        "roots": np.array(roots, dtype=np.int32),
+    }
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), array)
+    meta = {
+        "version": FORMAT_VERSION,
+        "classes": [str(c) for c in classes],
+        "features": list(features),
+        "trees": len(roots),
+        "nodes": offset,
+        "max_depth": int(max_depth),
+    }
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return directory
+
+
+class CompactForest:
+    """Batch inference over an exported forest; the arrays stay memory-mapped."""
+
+    def __init__(self, arrays: dict, meta: dict):
+        self.meta = meta
+        self.classes = np.array(meta["classes"], dtype=object)
+        self.features: List[str] = meta["features"]
+        self.max_depth = meta["max_depth"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.children = arrays["children"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, "meta.json"))
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "CompactForest":
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{directory}: unsupported compact model version {meta.get('version')}")
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None)
+                  for name in ARRAYS}
+        return cls(arrays, meta)
+
+    def leaves(self, X: np.ndarray) -> np.ndarray:
+        """
+        (rows, trees) leaf node ids. All (row, tree) pairs descend one level per step, with
+        flat np.take gathers; pairs that reached a leaf are periodically dropped from the working
+        set, so shallow paths stop costing anything.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat_x = X.ravel()
+        roots = np.asarray(self.roots, dtype=np.intp)
+        nodes = np.tile(roots, n_rows)                                 # row-major (row, tree)
+        slots = np.arange(len(nodes))
+        base = np.repeat(np.arange(n_rows, dtype=np.intp) * n_features, len(roots))
+        feature, threshold = self.feature, self.threshold
+        children = self.children.reshape(-1)
+        active = nodes.copy()
+        for level in range(self.max_depth):
+            go_right = flat_x.take(base + feature.take(active)) > threshold.take(active)
+            moved = children.take(active * 2 + go_right)
+            if level % COMPACT_EVERY == COMPACT_EVERY - 1:
+                nodes[slots] = moved
+                keep = np.flatnonzero(moved != active)                # leaves point to themselves
+                slots, base, moved = slots.take(keep), base.take(keep), moved.take(keep)
+                if not len(slots):
+                    break
+            active = moved
+        else:
+            nodes[slots] = active
+        return nodes.reshape(n_rows, len(roots))
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        if len(X) == 0:
+            return np.zeros((0, len(self.classes)), dtype=np.float32)
+        return np.concatenate([self.value[self.leaves(X[start:start + BATCH_ROWS])].mean(axis=1)
+                               for start in range(0, len(X), BATCH_ROWS)])
+
+    def predict(self, X: np.ndarray) -> List[str]:
+        """Label names (not encoded ids), like LabelEncoder.inverse_transform(model.predict(X))."""
+        return list(self.classes[self.predict_proba(X).argmax(axis=1)])
+
+
+# --- export / bench ---
+
+def export_pickles(models_dir: str = MODELS_DIR) -> str:
+    import joblib
+    model = joblib.load(os.path.join(models_dir, "link_classifier.pkl"))
+    encoder = joblib.load(os.path.join(models_dir, "label_encoder.pkl"))
+    features = joblib.load(os.path.join(models_dir, "feature_names.pkl"))
+    classes = encoder.inverse_transform(model.classes_)
+    return export_forest(model, classes, features, os.path.join(models_dir, COMPACT_DIR))
+
+
+def _best(fn, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def bench(args) -> int:
+    import joblib
+    import pandas as pd
+    from features import build_features, load_records
+
+    directory = os.path.join(args.models, COMPACT_DIR)
+    started = time.perf_counter()
+    forest = CompactForest.load(directory)
+    compact_load = time.perf_counter() - started
+    started = time.perf_counter()
+    model = joblib.load(os.path.join(args.models, "link_classifier.pkl"))
+    encoder = joblib.load(os.path.join(args.models, "label_encoder.pkl"))
+    sklearn_load = time.perf_counter() - started   # includes the sklearn import
+    print(f"load            sklearn {sklearn_load * 1000:8.1f} ms   compact {compact_load * 1000:8.1f} ms")
+
+    X = build_features(pd.DataFrame(load_records(args.data)))
+    expected = list(encoder.inverse_transform(model.predict(X)))
+    got = forest.predict(X.to_numpy())
+    differing = sum(a != b for a, b in zip(expected, got))
+    print(f"parity          {differing} of {len(X)} predictions differ")
+
+    for size in args.batch:
+        batch = X.iloc[np.arange(size) % len(X)]
+        values = batch.to_numpy()
+        slow = _best(lambda: encoder.inverse_transform(model.predict(batch.astype(float))), args.rounds)
+        fast = _best(lambda: forest.predict(values), args.rounds)
+        print(f"batch {size:>6}    sklearn {slow * 1000:8.1f} ms   compact {fast * 1000:8.1f} ms   "
+              f"per 1k pages {slow / size * 1e6:7.1f} / {fast / size * 1e6:7.1f} ms")
+    return 1 if differing else 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compact page classifier tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_parser = sub.add_parser("export", help="flatten models/link_classifier.pkl into models/link_classifier/")
+    export_parser.add_argument("--models", default=MODELS_DIR)
+    bench_parser = sub.add_parser("bench", help="load time, parity and batch latency vs. sklearn")
+    bench_parser.add_argument("--models", default=MODELS_DIR)
+    bench_parser.add_argument("--data", default=STORE_DIR, help="dataset store, or a directory of JSON exports")
+    bench_parser.add_argument("--batch", type=int, nargs="+", default=[1, 100, 1000, 10000])
+    bench_parser.add_argument("--rounds", type=int, default=5, help="best of N timings")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "export":
+        print(f"exported to {export_pickles(args.models)}")
+        sys.exit(0)
+    sys.exit(bench(args))
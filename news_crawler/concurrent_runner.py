@@ -5,8 +5,12 @@ import json
 import glob
 import time
 import shutil
+import argparse
 import traceback
 import re
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from multiprocessing import Pool
 from urllib.parse import urlparse
 from typing import List, Dict, Any
@@ -25,6 +29,14 @@ FINAL_LOG_FILE = os.path.join(LOGS_DIR, 'all_concurrent_unified.log')
 # Execution settings
 MAX_CONCURRENT_WORKERS = 4
 
+# Shared mode: global request cap of one CrawlerProcess shard (per-domain limits still apply)
+SHARED_MAX_CONCURRENT_REQUESTS = 32
+
+# Scheduling: expected duration for domains without history, and how much each
+# priority point (news_sites.priority) inflates a domain's scheduling weight
+DEFAULT_CRAWL_SECONDS = 300
+PRIORITY_WEIGHT = 0.05
+
 # Ensure required directories exist
 os.makedirs(LOGS_DIR, exist_ok=True)
 os.makedirs(RESULTS_DIR, exist_ok=True)
@@ -38,8 +50,12 @@ if ROOT_DIR not in sys.path:
 
 try:
     import database_manager as db
+    import crawl_stats
+    import record_io
 except ImportError:
     from news_crawler import database_manager as db
+    from news_crawler import crawl_stats
+    from news_crawler import record_io
 
 
 def clear_output_directories():
@@ -75,21 +91,99 @@ def log_to_unified_file(content):
         print(f"Logging error: {e}")
 
 
+def raw_output_path(site_data: Dict[str, str]) -> str:
+    """Raw output of a domain in whichever format the crawl wrote (see OUTPUT_FORMAT)."""
+    domain_clean = urlparse(site_data['start_url']).netloc.replace('www.', '').replace('.', '_')
+    stem = os.path.join(RESULTS_DIR, f"raw_{domain_clean}")
+    return record_io.find_output(stem) or f"{stem}.jsonl"
+
+
+def new_domain_stats(domain: str) -> Dict[str, Any]:
+    return {
+        "domain": domain, "total_pages": 0, "predicted_articles": 0,
+        "new_count": 0, "unchanged_count": 0, "updated_count": 0,
+        "filtering_pct": 0.0, "duration_sec": 0.0, "status": "FAILED"
+    }
+
+
+def scheduling_weight(site: Dict[str, Any], default_seconds: float) -> float:
+    # Expected duration from history, inflated by the site's priority
+    expected = site.get('avg_crawl_seconds') or default_seconds
+    return expected * (1 + PRIORITY_WEIGHT * (site.get('priority') or 0))
+
+
+def order_by_expected_duration(sites: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Longest-expected-first order, so slow domains never start last and stall the pool."""
+    known = [s['avg_crawl_seconds'] for s in sites if s.get('avg_crawl_seconds')]
+    default_seconds = statistics.median(known) if known else DEFAULT_CRAWL_SECONDS
+    return sorted(sites, key=lambda s: scheduling_weight(s, default_seconds), reverse=True)
+
+
+def process_domain_results(site_data: Dict[str, str], stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs classification and database sync on a crawled domain, using its stats file for all counts."""
+    domain = site_data['domain']
+    raw_json_absolute = raw_output_path(site_data)
+    stats_file = crawl_stats.stats_path_for(raw_json_absolute)
+
+    # 2. Page counting from the spider's crawl stats (no need to load the raw output)
+    domain_stats = crawl_stats.read_stats(stats_file)
+    stats["total_pages"] = domain_stats.get("crawl", {}).get("pages", 0)
+    if "crawl" not in domain_stats and os.path.exists(raw_json_absolute):
+        # The spider died before writing its stats: count the records it flushed, as a stream
+        stats["total_pages"] = record_io.count_records(raw_json_absolute)
+
+    # 3 Machine learning classification and database persistence
+    if stats["total_pages"] > 0:
+        # Pages already classified and stored by the item pipelines need no second pass
+        classified = domain_stats.get("prediction", {}).get("rows", 0)
+        if classified >= stats["total_pages"]:
+            log_to_unified_file(f"{domain}: {classified} pages classified during the crawl, skipping prediction.")
+        else:
+            # Only the records left unlabelled are classified and stored; the in-crawl counts are merged
+            predict_script = os.path.join(BASE_DIR, 'scripts', 'predict_new_site.py')
+            predict_cmd = [SCRAPY_PYTHON_EXEC, predict_script, raw_json_absolute]
+
+            p_res = subprocess.run(predict_cmd, cwd=BASE_DIR, capture_output=True, text=True, errors='replace')
+            log_to_unified_file(f"Database Operations for {domain}:\n{p_res.stdout}{p_res.stderr}")
+
+        # Counts published by the prediction step in the stats file
+        domain_stats = crawl_stats.read_stats(stats_file)
+        db_ops = domain_stats.get("prediction", {}).get("db", {})
+        stats["new_count"] = db_ops.get("new", 0)
+        stats["unchanged_count"] = db_ops.get("unchanged", 0)
+        stats["updated_count"] = db_ops.get("updated", 0)
+        stats["predicted_articles"] = stats["new_count"] + stats["unchanged_count"] + stats["updated_count"]
+        stats["timings"] = {**domain_stats.get("crawl", {}).get("timings", {}),
+                            **domain_stats.get("prediction", {}).get("timings", {})}
+        log_to_unified_file(f"Stats for {domain}: {json.dumps(domain_stats, ensure_ascii=False)}")
+
+        if stats["predicted_articles"] > 0:
+            print(
+                f"   -> {domain}: Completed. New: {stats['new_count']}, Updated: {stats['updated_count']}, Unchanged: {stats['unchanged_count']}")
+
+    # Finalize metrics
+    if stats["total_pages"] > 0:
+        noise_pages = stats["total_pages"] - stats["predicted_articles"]
+        stats["filtering_pct"] = (noise_pages / stats["total_pages"]) * 100
+        stats["status"] = "SUCCESS"
+    elif domain_stats.get("crawl", {}).get("frontier_skipped", 0) > 0 or \
+            domain_stats.get("crawl", {}).get("url_prefilter_skipped", 0) > 0:
+        # Every link was fetched recently (see FRONTIER_RECHECK_TTL) or scored as noise before
+        # fetching (see URL_PREFILTER_*): nothing to do is not a failure
+        stats["status"] = "SUCCESS"
+    return stats
+
+
 def run_single_crawl(site_data: Dict[str, str]) -> Dict[str, Any]:
     """Handles the full pipeline for a single domain: Scrape -> Predict -> Database Sync."""
     start_url = site_data['start_url']
     domain = site_data['domain']
-    domain_clean = urlparse(start_url).netloc.replace('www.', '').replace('.', '_')
-    raw_json_absolute = os.path.join(RESULTS_DIR, f"raw_{domain_clean}.json")
 
     log_to_unified_file(f"--- Processing Domain: {domain} ---")
     print(f"[WORKER {domain}] Processing...")
 
-    stats = {
-        "domain": domain, "total_pages": 0, "predicted_articles": 0,
-        "new_count": 0, "unchanged_count": 0, "updated_count": 0,
-        "filtering_pct": 0.0, "status": "FAILED"
-    }
+    stats = new_domain_stats(domain)
+    started = time.time()
 
     try:
         # 1. Scrapy and Playwright Crawling Phase
@@ -104,69 +198,155 @@ def run_single_crawl(site_data: Dict[str, str]) -> Dict[str, Any]:
         # Save detailed Scrapy/Playwright output for debugging
         log_to_unified_file(f"--- Technical Scrapy/Playwright logs for {domain} ---\n{result.stderr}")
 
-        # 2. Raw Data Validation & Page Counting
-        if os.path.exists(raw_json_absolute):
-            try:
-                with open(raw_json_absolute, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    stats["total_pages"] = len(data) if isinstance(data, list) else 1
-            except Exception:
-                stats["total_pages"] = 0
-
-        # 3 Machine learning classification and database persistence
-        if stats["total_pages"] > 0:
-            predict_script = os.path.join(BASE_DIR, 'scripts', 'predict_new_site.py')
-            predict_cmd = [SCRAPY_PYTHON_EXEC, predict_script, raw_json_absolute]
-
-            # Execute classification script and capture stdout tags
-            p_res = subprocess.run(predict_cmd, cwd=BASE_DIR, capture_output=True, text=True, errors='replace')
-            pred_output = p_res.stdout
-
-            log_to_unified_file(f"Database Operations for {domain}:\n{pred_output}")
-
-            # Parse results based on status tags printed by database_manager
-            stats["new_count"] = pred_output.count("[NEW]")
-            stats["unchanged_count"] = pred_output.count("[UNCHANGED]")
-            stats["updated_count"] = pred_output.count("[UPDATED]")
-            stats["predicted_articles"] = stats["new_count"] + stats["unchanged_count"] + stats["updated_count"]
-
-            if stats["predicted_articles"] > 0:
-                print(
-                    f"   -> {domain}: Completed. New: {stats['new_count']}, Updated: {stats['updated_count']}, Unchanged: {stats['unchanged_count']}")
-
-        # Finalize metrics
-        if stats["total_pages"] > 0:
-            noise_pages = stats["total_pages"] - stats["predicted_articles"]
-            stats["filtering_pct"] = (noise_pages / stats["total_pages"]) * 100
-            stats["status"] = "SUCCESS"
-
-        log_to_unified_file(f"Worker FINISHED: {domain}\n" + "-" * 50)
+        stats = process_domain_results(site_data, stats)
+        stats["duration_sec"] = time.time() - started
+        log_to_unified_file(f"Worker FINISHED: {domain} in {stats['duration_sec']:.0f}s\n" + "-" * 50)
         return stats
 
     except Exception as e:
         log_to_unified_file(f"Worker ERROR: {domain} -> {str(e)}")
+        stats["duration_sec"] = time.time() - started
         return stats
 
 
+def split_into_shards(sites: List[Dict[str, Any]], shard_count: int) -> List[List[Dict[str, Any]]]:
+    # Greedy longest-processing-time assignment: each domain goes to the least loaded shard
+    shard_count = max(1, min(shard_count, len(sites)))
+    known = [s['avg_crawl_seconds'] for s in sites if s.get('avg_crawl_seconds')]
+    default_seconds = statistics.median(known) if known else DEFAULT_CRAWL_SECONDS
+
+    shards = [[] for _ in range(shard_count)]
+    loads = [0.0] * shard_count
+    for site in order_by_expected_duration(sites):
+        target = loads.index(min(loads))
+        shards[target].append(site)
+        loads[target] += site.get('avg_crawl_seconds') or default_seconds
+    return shards
+
+
+def run_crawl_shard(sites: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Crawls several domains in one CrawlerProcess: one reactor, one Scrapy startup and one
+    Chromium instance shared by all of them. Runs in a fresh worker process because the
+    Twisted reactor cannot be restarted.
+    """
+    shard_name = "shard_" + "_".join(s['domain'].split('.')[0] for s in sites[:3])
+    shard_log = os.path.join(LOGS_DIR, f"{shard_name}.log")
+    domains = [s['domain'] for s in sites]
+    all_stats = {d: new_domain_stats(d) for d in domains}
+    log_to_unified_file(f"--- Processing shard ({len(sites)} domains): {', '.join(domains)} ---")
+    print(f"[SHARD {shard_name}] Crawling {len(sites)} domains in one process...")
+
+    try:
+        os.chdir(ROOT_DIR)
+        os.environ.setdefault('SCRAPY_SETTINGS_MODULE', 'news_crawler.settings')
+        from scrapy.crawler import CrawlerProcess
+        from scrapy.utils.project import get_project_settings
+
+        settings = get_project_settings()
+        per_domain = settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN')
+        settings.set('CONCURRENT_REQUESTS', max(settings.getint('CONCURRENT_REQUESTS'),
+                                                min(per_domain * len(sites), SHARED_MAX_CONCURRENT_REQUESTS)))
+        settings.set('LOG_LEVEL', 'INFO')
+        settings.set('LOG_FILE', shard_log)
+        settings.set('TELNETCONSOLE_ENABLED', False)
+
+        process = CrawlerProcess(settings)
+        crawler = process.create_crawler('universal_scraper')
+        process.crawl(crawler, sites=sites)
+        process.start()
+
+        # Per-domain counters collected by the spider in the shared stats collector
+        crawl_stats = crawler.stats.get_stats()
+        for domain in domains:
+            prefix = f"domain/{domain}/"
+            per_domain_stats = {k[len(prefix):]: v for k, v in crawl_stats.items() if k.startswith(prefix)}
+            if 'started_at' in per_domain_stats and 'last_item_at' in per_domain_stats:
+                all_stats[domain]["duration_sec"] = per_domain_stats['last_item_at'] - per_domain_stats['started_at']
+            log_to_unified_file(f"Crawl stats for {domain}: {per_domain_stats}")
+
+        if os.path.exists(shard_log):
+            with open(shard_log, 'r', encoding='utf-8', errors='replace') as f:
+                log_to_unified_file(f"--- Technical Scrapy/Playwright logs for {shard_name} ---\n{f.read()}")
+    except Exception as e:
+        log_to_unified_file(f"Shard ERROR: {shard_name} -> {str(e)}\n{traceback.format_exc()}")
+        return list(all_stats.values())
+
+    for site in sites:
+        try:
+            post_started = time.time()
+            all_stats[site['domain']] = process_domain_results(site, all_stats[site['domain']])
+            all_stats[site['domain']]["duration_sec"] += time.time() - post_started
+        except Exception as e:
+            log_to_unified_file(f"Worker ERROR: {site['domain']} -> {str(e)}")
+    log_to_unified_file(f"Shard FINISHED: {shard_name}\n" + "-" * 50)
+    return list(all_stats.values())
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Concurrent crawl -> predict -> database pipeline.")
+    parser.add_argument("--mode", choices=["subprocess", "shared"], default=os.environ.get("CRAWL_MODE", "subprocess"),
+                        help="subprocess: one Scrapy process per domain; "
+                             "shared: all domains in one (or --shards) CrawlerProcess instances")
+    parser.add_argument("--shards", type=int, default=int(os.environ.get("CRAWL_SHARDS", 1)),
+                        help="number of CrawlerProcess instances in shared mode")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
     clear_output_directories()
+    try:
+        db.migrate_schema()
+    except db.db_connector.Error as err:
+        sys.stderr.write(f"CRITICAL MIGRATION ERROR: {err}\n")
+        sys.exit(1)
     active_sites = db.get_active_sites()
 
-    print(f"Initializing concurrent crawl for {len(active_sites)} sources...")
-
-    # Start the parallel processing pool
-    with Pool(processes=MAX_CONCURRENT_WORKERS) as pool:
-        all_stats = pool.map(run_single_crawl, active_sites)
+    print(f"Initializing concurrent crawl for {len(active_sites)} sources (mode: {args.mode})...")
+
+    all_stats = []
+    if args.mode == "shared":
+        # Every shard gets a fresh spawned process with its own reactor and browser. One single-use
+        # executor per shard: the reactor cannot be restarted, and unlike Pool workers these processes
+        # are not daemonic, so the spider can start its extraction process pool.
+        shards = split_into_shards(active_sites, args.shards)
+        spawn = multiprocessing.get_context("spawn")
+        executors = [ProcessPoolExecutor(max_workers=1, mp_context=spawn) for _ in shards]
+        try:
+            futures = [executor.submit(run_crawl_shard, shard) for executor, shard in zip(executors, shards)]
+            for future in as_completed(futures):
+                all_stats.extend(future.result())
+        finally:
+            for executor in executors:
+                executor.shutdown()
+    else:
+        # Dynamic dispatch, longest expected domains first: idle workers pick up the next domain
+        with Pool(processes=MAX_CONCURRENT_WORKERS) as pool:
+            for stats in pool.imap_unordered(run_single_crawl, order_by_expected_duration(active_sites), chunksize=1):
+                print(f"   <- {stats['domain']}: {stats['status']} in {stats['duration_sec']:.0f}s "
+                      f"({stats['total_pages']} pages)")
+                all_stats.append(stats)
+
+    # Feed the measured durations back into the scheduler's history
+    for stats in all_stats:
+        if stats["status"] == "SUCCESS" and stats["duration_sec"] > 0:
+            db.record_crawl_duration(stats["domain"], stats["duration_sec"])
+    log_to_unified_file(f"Runner DB pool: {json.dumps(db.pool_stats())}")
+
+    # Results arrive in completion order; report them in the sites' priority order
+    site_order = {s['domain']: i for i, s in enumerate(active_sites)}
+    all_stats.sort(key=lambda s: site_order.get(s['domain'], len(site_order)))
 
     #table1: PIPELINE PERFORMANCE SUMMARY
     line_width = 95
     summary = "\n" + "=" * line_width + "\n"
-    summary += f"{'Source Domain':<30} | {'Pages':<10} | {'Articles':<10} | {'Noise Filtering %':<20}\n"
+    summary += f"{'Source Domain':<30} | {'Pages':<10} | {'Articles':<10} | {'Noise Filtering %':<20} | {'Time (s)':<8}\n"
     summary += "-" * line_width + "\n"
 
     total_p, total_a, total_new, total_unchanged, total_updated = 0, 0, 0, 0, 0
     for s in all_stats:
-        row = f"{s['domain']:<30} | {s['total_pages']:<10} | {s['predicted_articles']:<10} | {s['filtering_pct']:>18.1f}%\n"
+        row = f"{s['domain']:<30} | {s['total_pages']:<10} | {s['predicted_articles']:<10} | {s['filtering_pct']:>19.1f}% | {s.get('duration_sec', 0):>8.0f}\n"
         summary += row
         total_p += s['total_pages']
         total_a += s['predicted_articles']
@@ -0,0 +1,41 @@
+import time
+from typing import Dict
+
+# Per-domain page and time budget of one crawl (CRAWL_DOMAIN_MAX_PAGES / CRAWL_DOMAIN_MAX_SECONDS).
+# Pages are charged when their request leaves the scheduler (CrawlBudgetMiddleware), so with the
+# spider's best-first priorities the budget goes to the highest-ranked links queued at that moment.
+
+
+class CrawlBudget:
+    def __init__(self, max_pages: int = 0, max_seconds: float = 0):
+        self.max_pages = max_pages
+        self.max_seconds = max_seconds
+        self.started: Dict[str, float] = {}
+        self.spent: Dict[str, int] = {}
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            max_pages=settings.getint('CRAWL_DOMAIN_MAX_PAGES', 0),
+            max_seconds=settings.getfloat('CRAWL_DOMAIN_MAX_SECONDS', 0),
+        )
+
+    @property
+    def limited(self) -> bool:
+        return bool(self.max_pages or self.max_seconds)
+
+    def start(self, domain: str, now: float = None):
+        self.started.setdefault(domain, now or time.time())
+
+    def exhausted(self, domain: str, now: float = None) -> bool:
+        if self.max_pages and self.spent.get(domain, 0) >= self.max_pages:
+            return True
+        started = self.started.get(domain)
+        return bool(self.max_seconds and started and (now or time.time()) - started >= self.max_seconds)
+
+    def charge(self, domain: str) -> bool:
+        """Counts one page against the domain's budget; False if nothing is left."""
+        if self.exhausted(domain):
+            return False
+        self.spent[domain] = self.spent.get(domain, 0) + 1
+        return True
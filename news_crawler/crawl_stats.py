@@ -0,0 +1,67 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Any
+
+# Machine-readable stats exchanged between the spider, the prediction step and the runner.
+# One JSON file per domain next to its raw output (results/stats_<domain>.json), holding one
+# section per stage: "crawl" (written by the spider) and "prediction" (classification + DB sync),
+# the latter written either by the item pipelines during the crawl or by scripts/predict_new_site.py.
+
+
+def stats_path_for(output_path: str) -> str:
+    """Stats file that belongs to a raw output file (results/raw_x.json -> results/stats_x.json)."""
+    directory, filename = os.path.split(output_path)
+    stem = filename.split('.', 1)[0]
+    if stem.startswith('raw_'):
+        stem = stem[len('raw_'):]
+    return os.path.join(directory, f"stats_{stem}.json")
+
+
+def read_stats(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        sys.stderr.write(f"Warning: unreadable stats file {path}: {e}\n")
+        return {}
+
+
+def clear_stats(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def write_stats_section(path: str, section: str, data: Dict[str, Any]):
+    # Read-modify-write of a single section, replaced atomically so readers never see partial files
+    stats = read_stats(path)
+    stats[section] = data
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(stats, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+class StageTimer:
+    """Accumulates wall-clock seconds per named stage."""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - started
+
+    def as_dict(self) -> Dict[str, float]:
+        return {k: round(v, 3) for k, v in self.timings.items()}
@@ -3,8 +3,16 @@ from datetime import datetime
 import hashlib
 import sys
 import os
+import queue
+import threading
+import time
+from collections import Counter, defaultdict
 from typing import Dict, List, Any
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Shared with the MySQL container's docker-entrypoint-initdb.d
+SCHEMA_FILE = os.path.join(os.path.dirname(BASE_DIR), 'initdb', 'setup.sql')
+
 # db configuration from environment variables or defaults
 MYSQL_CONFIG = {
     'host': os.environ.get('DB_HOST', '127.0.0.1'),
@@ -13,9 +21,165 @@ MYSQL_CONFIG = {
     'database': os.environ.get('DB_NAME', 'news_crawler_db')
 }
 
+# Per-article [NEW]/[UPDATED]/[UNCHANGED] lines on stdout (counts are returned to callers instead)
+LOG_ARTICLE_STATUS = os.environ.get('DB_LOG_ARTICLES', '0') == '1'
+
+# Status values returned by save_article
+STATUS_NEW = "new"
+STATUS_UPDATED = "updated"
+STATUS_UNCHANGED = "unchanged"
+
+# ArticleWriter defaults: rows per flush and max seconds an article may wait in the buffer
+WRITE_BATCH_SIZE = int(os.environ.get('DB_WRITE_BATCH_SIZE', 100))
+WRITE_MAX_DELAY = float(os.environ.get('DB_WRITE_MAX_DELAY', 5.0))
+
+# Connection pool: max open connections per process, seconds to wait for a free one,
+# and idle seconds after which a connection is pinged (and reconnected) before reuse
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 4))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+POOL_PING_INTERVAL = float(os.environ.get('DB_POOL_PING_INTERVAL', 10))
+
+
+class PooledConnection:
+    """
+    A checked-out connection. Behaves like the mysql.connector connection it wraps,
+    but close() (or leaving a with block) hands it back to the pool.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self, failed=False):
+        if not self._released:
+            self._released = True
+            self._pool.release(self._conn, failed=failed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # a connection that raised is rolled back and pinged before its next use
+        self.close(failed=exc_type is not None)
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of MySQL connections with at most `size` connections open.
+    Connections are health-checked with ping(reconnect=True) when they come back from an error
+    or sat idle longer than ping_interval; ones that cannot be revived are replaced.
+    """
+
+    def __init__(self, size=POOL_SIZE, timeout=POOL_TIMEOUT, ping_interval=POOL_PING_INTERVAL, config=None):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.config = config or MYSQL_CONFIG
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(self.size)
+        self.metrics = Counter()
+        self.wait_max = 0.0
+
+    def _check_pid(self):
+        # A forked child must not share the parent's sockets: start over with an empty pool
+        if self.pid != os.getpid():
+            self._reset()
+
+    def _connect(self):
+        conn = db_connector.connect(**self.config, charset='utf8mb4')
+        self.metrics['created'] += 1
+        return conn
+
+    def _revive(self, conn):
+        self.metrics['health_checks'] += 1
+        try:
+            conn.ping(reconnect=True, attempts=2, delay=0.2)
+            return conn
+        except Exception:
+            self.metrics['discarded'] += 1
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return None
+
+    def get(self):
+        self._check_pid()
+        started = time.perf_counter()
+        if not self.slots.acquire(timeout=self.timeout):
+            self.metrics['timeouts'] += 1
+            raise db_connector.errors.PoolError(f"no free connection after {self.timeout}s (DB_POOL_SIZE={self.size})")
+        waited = time.perf_counter() - started
+        self.metrics['checkouts'] += 1
+        self.metrics['wait_seconds'] += waited
+        self.wait_max = max(self.wait_max, waited)
+
+        try:
+            conn = None
+            while conn is None:
+                try:
+                    candidate, released_at, failed = self.idle.get_nowait()
+                except queue.Empty:
+                    conn = self._connect()
+                    break
+                if failed or time.monotonic() - released_at > self.ping_interval:
+                    conn = self._revive(candidate)
+                else:
+                    conn = candidate
+        except Exception:
+            self.slots.release()
+            raise
+        return PooledConnection(self, conn)
+
+    def release(self, conn, failed=False):
+        if self.pid != os.getpid():
+            # checked out before a fork, belongs to the parent's pool
+            return
+        try:
+            if failed or conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            failed = True
+        self.idle.put((conn, time.monotonic(), failed))
+        self.slots.release()
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "created": self.metrics['created'],
+            "checkouts": self.metrics['checkouts'],
+            "wait_seconds": round(self.metrics['wait_seconds'], 3),
+            "wait_max_seconds": round(self.wait_max, 3),
+            "health_checks": self.metrics['health_checks'],
+            "discarded": self.metrics['discarded'],
+            "timeouts": self.metrics['timeouts'],
+        }
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def get_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ConnectionPool()
+        return _POOL
+
 def get_connection():
-    # returns a connection to the MySQL database
-    return db_connector.connect(**MYSQL_CONFIG, charset='utf8mb4')
+    # returns a pooled connection to the MySQL database; close() gives it back to the pool
+    return get_pool().get()
+
+def pool_stats():
+    return get_pool().stats()
 
 def initialize_db():
     # Initialize database and tables
@@ -30,44 +194,95 @@ def initialize_db():
         sys.exit(1)
 
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        # news_sites table: Source management
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS news_sites (
-            id INT PRIMARY KEY AUTO_INCREMENT,
-            domain VARCHAR(255) UNIQUE,
-            start_url TEXT,
-            last_visited DATETIME,
-            active TINYINT DEFAULT 1,
-            priority INT DEFAULT 10
-        )
-        """)
-
-        # articles table: Stores scraped content and metadata
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS articles (
-            id INT PRIMARY KEY AUTO_INCREMENT,
-            site_id INT NOT NULL,
-            url TEXT,
-            title TEXT,
-            body LONGTEXT,
-            image_url TEXT,
-            scraped_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            content_hash VARCHAR(32),
-            last_cited_date DATETIME,
-            FOREIGN KEY(site_id) REFERENCES news_sites(id),
-            UNIQUE KEY unique_url_idx (url(255)) 
-        )
-        """)
-        conn.commit()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            # table definitions only: the site seed rows are for a fresh docker volume (initdb),
+            # re-running them here would bring back sites an operator deleted
+            for statement in load_schema_statements():
+                if statement.upper().startswith('CREATE'):
+                    cursor.execute(statement)
+            conn.commit()
+        migrate_schema()
         print("Database initialization completed successfully.")
-    except db_connector.Error as err:
+    except (db_connector.Error, OSError) as err:
         sys.stderr.write(f"CRITICAL SCHEMA ERROR: {err}\n")
         sys.exit(1)
 
+def load_schema_statements(schema_file=SCHEMA_FILE):
+    # Splits setup.sql into statements (full-line '--' comments dropped)
+    with open(schema_file, 'r', encoding='utf-8') as f:
+        lines = [line for line in f if not line.lstrip().startswith('--')]
+    return [stmt.strip() for stmt in ''.join(lines).split(';') if stmt.strip()]
+
+def url_hash(url):
+    # Same digest as MySQL's UNHEX(MD5(url)) on the utf8mb4 url column
+    return hashlib.md5((url or '').encode('utf-8')).digest()
+
+def column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    return cursor.fetchone()[0] > 0
+
+def column_nullable(cursor, table, column):
+    cursor.execute("""
+        SELECT IS_NULLABLE FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    row = cursor.fetchone()
+    return bool(row) and row[0] == 'YES'
+
+def index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (table, index))
+    return cursor.fetchone()[0] > 0
+
+def migrate_schema():
+    # Brings databases created by older versions up to the current schema. Every step is gated on
+    # its end state, so a run that failed halfway is completed by the next one. Errors propagate:
+    # without unique_url_hash_idx the upserts would insert a duplicate row on every recrawl.
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        if not column_exists(cursor, 'news_sites', 'avg_crawl_seconds'):
+            cursor.execute("ALTER TABLE news_sites ADD COLUMN avg_crawl_seconds FLOAT NULL")
+            print("Migration: added news_sites.avg_crawl_seconds")
+
+        # url_hash replaces the 255-char url prefix index, which collided on long shared slugs
+        needs_hash_key = not index_exists(cursor, 'articles', 'unique_url_hash_idx')
+        url_nullable = column_nullable(cursor, 'articles', 'url')
+        if needs_hash_key or url_nullable:
+            # the old schema allowed NULL urls; such rows can be neither keyed nor upserted
+            cursor.execute("DELETE FROM articles WHERE url IS NULL")
+            if cursor.rowcount:
+                print(f"Migration: removed {cursor.rowcount} articles without a url")
+        if needs_hash_key:
+            if not column_exists(cursor, 'articles', 'url_hash'):
+                cursor.execute("ALTER TABLE articles ADD COLUMN url_hash BINARY(16) NULL AFTER url")
+            cursor.execute("UPDATE articles SET url_hash = UNHEX(MD5(url))")
+            # rows duplicated while the key was missing: keep the first copy of each url
+            cursor.execute("DELETE a FROM articles a JOIN articles b ON a.url_hash = b.url_hash AND a.id > b.id")
+            if cursor.rowcount:
+                print(f"Migration: removed {cursor.rowcount} duplicate articles")
+            cursor.execute("ALTER TABLE articles MODIFY url_hash BINARY(16) NOT NULL, "
+                           "ADD UNIQUE KEY unique_url_hash_idx (url_hash)")
+            print("Migration: added articles.url_hash")
+        if index_exists(cursor, 'articles', 'unique_url_idx'):
+            cursor.execute("ALTER TABLE articles DROP INDEX unique_url_idx")
+            print("Migration: dropped articles.unique_url_idx")
+        if url_nullable:
+            cursor.execute("ALTER TABLE articles MODIFY url TEXT NOT NULL")
+            print("Migration: articles.url is NOT NULL")
+        if not index_exists(cursor, 'articles', 'site_scraped_idx'):
+            cursor.execute("ALTER TABLE articles ADD KEY site_scraped_idx (site_id, scraped_at)")
+            print("Migration: added articles.site_scraped_idx")
+        if not index_exists(cursor, 'articles', 'content_hash_idx'):
+            cursor.execute("ALTER TABLE articles ADD KEY content_hash_idx (content_hash)")
+            print("Migration: added articles.content_hash_idx")
+        conn.commit()
+
 def normalize_domain(domain):
     # Removes www. prefix from domain string
     if domain and domain.startswith("www."):
@@ -77,12 +292,13 @@ def normalize_domain(domain):
 def get_active_sites():
     # Fetch all active news sources ordered by priority
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT id, domain, start_url FROM news_sites WHERE active = 1 ORDER BY priority DESC")
-        rows = cursor.fetchall()
-        conn.close()
-        return rows
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT id, domain, start_url, priority, last_visited, avg_crawl_seconds
+                FROM news_sites WHERE active = 1 ORDER BY priority DESC
+            """)
+            return cursor.fetchall()
     except db_connector.Error as err:
         sys.stderr.write(f"QUERY ERROR (Active Sites): {err}\n")
         return []
@@ -90,31 +306,51 @@ def get_active_sites():
 def update_last_visited(domain):
     # Logs the timestamp of the last crawler visit per domain
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE news_sites SET last_visited = NOW() WHERE domain = %s", (domain,))
-        conn.commit()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE news_sites SET last_visited = NOW() WHERE domain = %s", (domain,))
+            conn.commit()
     except Exception as e:
         sys.stderr.write(f" ERROR (last_visited): {e}\n")
 
+def record_crawl_duration(domain, seconds, smoothing=0.5):
+    # Keeps an exponentially weighted average of crawl durations, used to schedule long domains first
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE news_sites
+                SET avg_crawl_seconds = IF(avg_crawl_seconds IS NULL, %s, avg_crawl_seconds * (1 - %s) + %s * %s)
+                WHERE domain = %s
+            """, (seconds, smoothing, seconds, smoothing, domain))
+            conn.commit()
+    except Exception as e:
+        sys.stderr.write(f" ERROR (crawl duration): {e}\n")
+
+def log_article_status(status, url):
+    if LOG_ARTICLE_STATUS:
+        sys.stdout.write(f"[{status.upper()}] {url}\n")
+
 def save_article(site_id, url, title, body, image_url):
-    # Saves a new article or updates an existing one using MD5 hash comparison
+    # Saves a new article or updates an existing one using MD5 hash comparison.
+    # Returns STATUS_NEW / STATUS_UPDATED / STATUS_UNCHANGED, or None on failure.
     try:
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
     except db_connector.Error as err:
         sys.stderr.write(f"CONNECTION ERROR (save_article): {err}\n")
-        return
+        return None
 
     title_safe = title or 'No Title'
     body_safe = body or ''
     image_url_safe = image_url or ''
     content_hash = hashlib.md5(body_safe.encode('utf-8')).hexdigest()
+    digest = url_hash(url)
+    status = None
 
     try:
         # Check if URL already exists in database
-        cursor.execute("SELECT id, content_hash FROM articles WHERE url = %s", (url,))
+        cursor.execute("SELECT id, content_hash FROM articles WHERE url_hash = %s", (digest,))
         row = cursor.fetchone()
 
         if row:
@@ -127,25 +363,160 @@ def save_article(site_id, url, title, body, image_url):
                         last_cited_date = NOW()
                     WHERE id = %s
                 """, (title_safe, body_safe, image_url_safe, content_hash, article_id))
-                sys.stdout.write(f"[UPDATED] {url}\n")
+                status = STATUS_UPDATED
             else:
                 # Content unchanged, update last seen timestamp
                 cursor.execute("UPDATE articles SET last_cited_date = NOW() WHERE id = %s", (article_id,))
-                sys.stdout.write(f"[UNCHANGED] {url}\n")
+                status = STATUS_UNCHANGED
         else:
             # New URL found, perform insert
             cursor.execute("""
                 INSERT INTO articles (
-                    site_id, url, title, body, image_url, content_hash, last_cited_date
-                ) VALUES (%s, %s, %s, %s, %s, %s, NOW())
-            """, (site_id, url, title_safe, body_safe, image_url_safe, content_hash))
-            sys.stdout.write(f"[NEW] {url}\n")
+                    site_id, url, url_hash, title, body, image_url, content_hash, last_cited_date
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
+            """, (site_id, url, digest, title_safe, body_safe, image_url_safe, content_hash))
+            status = STATUS_NEW
 
         conn.commit()
+        log_article_status(status, url)
     except Exception as e:
         sys.stderr.write(f"SQL ERROR for {url}: {e}\n")
+        status = None
+        conn.close(failed=True)
     finally:
         conn.close()
+    return status
+
+class ArticleWriter:
+    """
+    Buffered replacement for save_article when many articles are stored in a row.
+    Articles are flushed when the buffer holds batch_size of them or its oldest one has waited
+    max_delay seconds, using one multi-row INSERT ... ON DUPLICATE KEY UPDATE for new/changed
+    articles and one UPDATE of last_cited_date for unchanged ones. Status counts are kept per
+    caller-supplied key (e.g. output file).
+
+    With preload, the first flush for a site loads its url_hash -> (id, content_hash) snapshot in
+    one query and articles of that site are compared locally; otherwise (and for URLs missing from
+    the snapshot) each flush runs a SELECT ... WHERE url_hash IN (...) for the MD5 content_hash comparison.
+    """
+
+    def __init__(self, batch_size: int = WRITE_BATCH_SIZE, max_delay: float = WRITE_MAX_DELAY,
+                 preload: bool = True):
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max_delay
+        self.preload = preload
+        self.buffer: Dict[bytes, Dict[str, Any]] = {}
+        self.oldest_at = None
+        self.counts = defaultdict(Counter)
+        self.flushes = 0
+        # site_id -> {url_hash: (id, md5 digest of the body)}; 16-byte keys and values keep it compact
+        self.snapshots: Dict[Any, Dict[bytes, tuple]] = {}
+        self.snapshot_rows = 0
+
+    def add(self, site_id, url, title, body, image_url, key=None):
+        body_safe = body or ''
+        if not self.buffer:
+            self.oldest_at = time.monotonic()
+        digest = url_hash(url)
+        # A URL seen twice before a flush is stored once, with its latest content
+        self.buffer[digest] = {
+            'site_id': site_id, 'url': url, 'url_hash': digest, 'title': title or 'No Title', 'body': body_safe,
+            'image_url': image_url or '', 'key': key,
+            'content_digest': hashlib.md5(body_safe.encode('utf-8')).digest(),
+        }
+        if len(self.buffer) >= self.batch_size or time.monotonic() - self.oldest_at >= self.max_delay:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        rows, self.buffer = list(self.buffer.values()), {}
+        self.flushes += 1
+
+        try:
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                existing = self._existing(cursor, rows)
+
+                changed, unchanged_ids, statuses = [], [], []
+                for row in rows:
+                    found = existing.get(row['url_hash'])
+                    if found is None:
+                        status = STATUS_NEW
+                    elif found[1] != row['content_digest']:
+                        status = STATUS_UPDATED
+                    else:
+                        status = STATUS_UNCHANGED
+                        # ids of rows inserted by this writer are unknown, they were just stamped anyway
+                        if found[0] is not None:
+                            unchanged_ids.append(found[0])
+                    if status != STATUS_UNCHANGED:
+                        changed.append(row)
+                    statuses.append(status)
+
+                if changed:
+                    values = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, NOW())'] * len(changed))
+                    params = [v for row in changed for v in (row['site_id'], row['url'], row['url_hash'], row['title'],
+                                                             row['body'], row['image_url'], row['content_digest'].hex())]
+                    cursor.execute(f"""
+                        INSERT INTO articles (
+                            site_id, url, url_hash, title, body, image_url, content_hash, last_cited_date
+                        ) VALUES {values}
+                        ON DUPLICATE KEY UPDATE
+                            title = VALUES(title), body = VALUES(body), image_url = VALUES(image_url),
+                            content_hash = VALUES(content_hash), last_cited_date = NOW()
+                    """, params)
+                if unchanged_ids:
+                    cursor.execute(f"UPDATE articles SET last_cited_date = NOW() WHERE id IN "
+                                   f"({', '.join(['%s'] * len(unchanged_ids))})", unchanged_ids)
+                conn.commit()
+        except Exception as e:
+            # the pool rolls back the failed connection before reusing it
+            sys.stderr.write(f"SQL ERROR (ArticleWriter, {len(rows)} articles): {e}\n")
+            for row in rows:
+                self.counts[row['key']]['errors'] += 1
+            return
+
+        for row, status in zip(rows, statuses):
+            self.counts[row['key']][status] += 1
+            log_article_status(status, row['url'])
+            snapshot = self.snapshots.get(row['site_id'])
+            if snapshot is not None and status != STATUS_UNCHANGED:
+                previous = existing.get(row['url_hash'])
+                snapshot[row['url_hash']] = (previous[0] if previous else None, row['content_digest'])
+
+    def _load_snapshot(self, cursor, site_id):
+        cursor.execute("SELECT id, url_hash, content_hash FROM articles WHERE site_id = %s", (site_id,))
+        snapshot = {bytes(digest): (article_id, bytes.fromhex(content_hash) if content_hash else None)
+                    for article_id, digest, content_hash in cursor.fetchall()}
+        self.snapshot_rows += len(snapshot)
+        return snapshot
+
+    def _existing(self, cursor, rows):
+        # Stored (id, content digest) per url_hash, from the site snapshots or a lookup query.
+        # url_hash is unique across sites, so a snapshot miss may still be stored under another
+        # site: misses are looked up too (one query per flush, only when there are misses)
+        existing, lookup = {}, []
+        for row in rows:
+            site_id = row['site_id']
+            if self.preload and site_id not in self.snapshots:
+                self.snapshots[site_id] = self._load_snapshot(cursor, site_id)
+            snapshot = self.snapshots.get(site_id)
+            if snapshot is not None and row['url_hash'] in snapshot:
+                existing[row['url_hash']] = snapshot[row['url_hash']]
+            else:
+                lookup.append(row['url_hash'])
+
+        if lookup:
+            cursor.execute(f"SELECT id, url_hash, content_hash FROM articles WHERE url_hash IN "
+                           f"({', '.join(['%s'] * len(lookup))})", lookup)
+            for article_id, digest, content_hash in cursor.fetchall():
+                existing[bytes(digest)] = (article_id, bytes.fromhex(content_hash) if content_hash else None)
+        return existing
+
+    def close(self):
+        self.flush()
+
 
 if __name__ == "__main__":
     initialize_db()
\ No newline at end of file
@@ -0,0 +1,374 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Columnar store of labeled pages (data/store/), replacing the pretty-printed data/*.json files as
+# the input of training and analysis. Each column is kept in its own files, so a consumer loads
+# only the columns it asks for and feature-only readers never touch article bodies:
+#
+#   int / float / bool   <col>.npy (memory-mapped on load)
+#   string               <col>.offsets.npy (int64 byte offsets, rows + 1) + <col>.utf8
+#   category             <col>.codes.npy (int32) + the same offsets/utf8 table for the distinct values
+#   json                 lists and mixed-type values, stored as a string column of JSON text
+#   <col>.valid.npy      present when the column has nulls (absent keys read back as None)
+#
+# meta.json holds the row count, the column kinds and the imported batches (file, SHA-1, rows).
+#
+#   python dataset_store.py import FILE ...     build the store from JSON exports (replaces it)
+#   python dataset_store.py append FILE ...     add labeled batches (.json / .jsonl[.gz|.zst])
+#   python dataset_store.py info                rows, columns, kinds and sizes
+#   python dataset_store.py verify FILE ...     store vs. the files it was built from, value by value
+
+try:
+    from . import record_io
+except ImportError:
+    import record_io
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+STORE_DIR = os.path.join(DATA_DIR, "store")
+STORE_VERSION = 1
+
+SOURCE_COLUMN = "source"
+# A string column with at most this share of distinct values is dictionary-encoded
+CATEGORY_MAX_DISTINCT = 0.5
+
+
+def file_sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_name(path: str) -> str:
+    return os.path.basename(record_io.split_suffix(path)[0])
+
+
+# --- encoding ---
+
+def infer_kind(values: List[Any]) -> str:
+    present = [v for v in values if v is not None]
+    if not present:
+        return "string"
+    types = {type(v) for v in present}
+    if types == {bool}:
+        return "bool"
+    if types == {int}:
+        return "int"
+    if types <= {int, float}:
+        return "float"
+    if types == {str}:
+        distinct = len(set(present))
+        return "category" if distinct <= max(1, CATEGORY_MAX_DISTINCT * len(values)) else "string"
+    return "json"
+
+
+def _string_table(strings: List[str]) -> Dict[str, Any]:
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return {"offsets": offsets, "utf8": b"".join(encoded)}
+
+
+def encode_column(values: List[Any]) -> Dict[str, Any]:
+    """{kind, nulls, arrays}: the files of one column, keyed by their suffix."""
+    kind = infer_kind(values)
+    valid = np.array([v is not None for v in values], dtype=bool)
+    if kind == "json":
+        values = [json.dumps(v, ensure_ascii=False) if v is not None else None for v in values]
+
+    if kind in ("int", "float", "bool"):
+        dtype = {"int": np.int64, "float": np.float64, "bool": bool}[kind]
+        fill = {"int": 0, "float": np.nan, "bool": False}[kind]
+        arrays = {"npy": np.array([fill if v is None else v for v in values], dtype=dtype)}
+    elif kind == "category":
+        table, codes = {}, np.full(len(values), -1, dtype=np.int32)
+        for i, v in enumerate(values):
+            if v is not None:
+                codes[i] = table.setdefault(v, len(table))
+        strings = _string_table(list(table))
+        arrays = {"codes.npy": codes, "offsets.npy": strings["offsets"], "utf8": strings["utf8"]}
+    else:
+        strings = _string_table(["" if v is None else v for v in values])
+        arrays = {"offsets.npy": strings["offsets"], "utf8": strings["utf8"]}
+
+    nulls = int((~valid).sum())
+    if nulls and kind != "category":   # category nulls are code -1
+        arrays["valid.npy"] = valid
+    return {"kind": kind, "nulls": nulls, "arrays": arrays}
+
+
+def _decode_strings(offsets: np.ndarray, blob: bytes) -> np.ndarray:
+    text = memoryview(blob)
+    bounds = offsets.tolist()
+    out = np.empty(len(bounds) - 1, dtype=object)
+    out[:] = [str(text[start:end], "utf-8") for start, end in zip(bounds, bounds[1:])]
+    return out
+
+
+class DatasetStore:
+    """A store directory; columns are read on demand and not kept in memory."""
+
+    def __init__(self, path: str = STORE_DIR):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != STORE_VERSION:
+            raise ValueError(f"{path}: unsupported dataset store version {self.meta.get('version')}")
+
+    @staticmethod
+    def exists(path: str = STORE_DIR) -> bool:
+        return os.path.exists(os.path.join(path, "meta.json"))
+
+    @property
+    def rows(self) -> int:
+        return self.meta["rows"]
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.meta["columns"])
+
+    def kind(self, name: str) -> str:
+        return self.meta["columns"][name]["kind"]
+
+    def _file(self, name: str, suffix: str) -> str:
+        return os.path.join(self.path, f"{name}.{suffix}")
+
+    def _valid(self, name: str) -> Optional[np.ndarray]:
+        path = self._file(name, "valid.npy")
+        return np.load(path, mmap_mode="r") if os.path.exists(path) else None
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Values of one column as a NumPy array, with the dtypes pd.DataFrame(records) would give:
+        numbers are memory-mapped (ints and bools with nulls become float / object), text columns
+        are object arrays with None for nulls, json columns hold the decoded values.
+        """
+        if name not in self.meta["columns"]:
+            raise KeyError(f"{self.path}: no column '{name}' (columns: {', '.join(self.columns)})")
+        kind = self.kind(name)
+        valid = self._valid(name)
+        if kind in ("int", "float", "bool"):
+            values = np.load(self._file(name, "npy"), mmap_mode="r")
+            if valid is None:
+                return values
+            if kind == "bool":
+                values = values.astype(object)
+                values[~valid] = None
+                return values
+            values = values.astype(np.float64)
+            values[~valid] = np.nan
+            return values
+
+        offsets = np.load(self._file(name, "offsets.npy"))
+        with open(self._file(name, "utf8"), "rb") as f:
+            strings = _decode_strings(offsets, f.read())
+        if kind == "category":
+            codes = np.load(self._file(name, "codes.npy"))
+            strings = np.append(strings, None)   # code -1 picks the trailing None
+            return strings[codes]
+        if valid is not None:
+            strings[~valid] = None
+        if kind == "json":
+            for i, text in enumerate(strings):   # element-wise: equal-length lists must stay lists
+                strings[i] = None if text is None else json.loads(text)
+        return strings
+
+    def load(self, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """The given columns (those the store has; all when None) as a DataFrame."""
+        names = self.columns if columns is None else [c for c in columns if c in self.meta["columns"]]
+        return pd.DataFrame({name: self.column(name) for name in names}, index=pd.RangeIndex(self.rows))
+
+    def iter_records(self, columns: Optional[Iterable[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Rows as dicts, without the keys whose value is null (as they were imported)."""
+        names = self.columns if columns is None else [c for c in columns if c in self.meta["columns"]]
+        data = {name: self.column(name) for name in names}
+        for i in range(self.rows):
+            record = {}
+            for name in names:
+                value = data[name][i]
+                if value is None or (isinstance(value, float) and np.isnan(value)):
+                    continue
+                record[name] = value.item() if isinstance(value, np.generic) else value
+            yield record
+
+    # --- writing ---
+
+    @classmethod
+    def create(cls, path: str, batches: List[Dict[str, Any]]) -> "DatasetStore":
+        """Writes a new store from batches of {source, sha1, records}, replacing path."""
+        names: Dict[str, None] = {}
+        for batch in batches:
+            for record in batch["records"]:
+                names.update(dict.fromkeys(record))
+        names[SOURCE_COLUMN] = None
+        columns = {name: [] for name in names}
+        for batch in batches:
+            for record in batch["records"]:
+                for name in names:
+                    columns[name].append(record.get(name))
+                columns[SOURCE_COLUMN][-1] = batch["source"]
+        rows = sum(len(batch["records"]) for batch in batches)
+        meta = {
+            "version": STORE_VERSION,
+            "rows": rows,
+            "columns": {},
+            "batches": [{"source": b["source"], "sha1": b["sha1"], "rows": len(b["records"]),
+                         "imported": b.get("imported", time.strftime("%Y-%m-%d %H:%M:%S"))} for b in batches],
+        }
+
+        tmp = path + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name, values in columns.items():
+            encoded = encode_column(values)
+            meta["columns"][name] = {"kind": encoded["kind"], "nulls": encoded["nulls"]}
+            for suffix, array in encoded["arrays"].items():
+                target = os.path.join(tmp, f"{name}.{suffix}")
+                if isinstance(array, bytes):
+                    with open(target, "wb") as f:
+                        f.write(array)
+                else:
+                    np.save(target, array)
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        # swap the finished directory in; a crash before this leaves the old store untouched
+        old = path + ".old"
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.exists(path):
+            os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+        return cls(path)
+
+    def append(self, batches: List[Dict[str, Any]], force: bool = False) -> "DatasetStore":
+        """
+        Adds batches to the store, skipping files already imported (same SHA-1) unless force.
+        Columns are rewritten whole, so a new key or a changed value type is handled like on import.
+        """
+        imported = {b["sha1"] for b in self.meta["batches"]}
+        fresh = []
+        for batch in batches:
+            if batch["sha1"] in imported and not force:
+                print(f"Skipping {batch['source']}: already imported")
+                continue
+            fresh.append(batch)
+        if not fresh:
+            return self
+
+        existing = []
+        records = list(self.iter_records())
+        start = 0
+        for batch in self.meta["batches"]:
+            rows = records[start:start + batch["rows"]]
+            for record in rows:
+                record.pop(SOURCE_COLUMN, None)
+            existing.append({**batch, "records": rows})
+            start += batch["rows"]
+        return DatasetStore.create(self.path, existing + fresh)
+
+
+def read_batch(path: str) -> Dict[str, Any]:
+    return {"source": source_name(path), "sha1": file_sha1(path), "records": list(record_io.iter_records(path))}
+
+
+def record_files(directory: str) -> List[str]:
+    """JSON / JSON Lines exports in a directory (predictions_*.json, raw_*.jsonl, ...)."""
+    return sorted(
+        os.path.join(directory, f) for f in os.listdir(directory)
+        if record_io.split_suffix(f)[1] and os.path.isfile(os.path.join(directory, f))
+    )
+
+
+def load_dataset(path: str = STORE_DIR, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    Labeled pages as a DataFrame: from a store directory (only the requested columns are read) or
+    from a directory of JSON exports (parsed whole, then the columns are selected).
+    """
+    if DatasetStore.exists(path):
+        return DatasetStore(path).load(columns)
+    df = pd.DataFrame(load_records(path))
+    return df if columns is None else df[[c for c in columns if c in df.columns]]
+
+
+def load_records(path: str = STORE_DIR, columns: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    """Same as load_dataset, as a list of dicts."""
+    if DatasetStore.exists(path):
+        return list(DatasetStore(path).iter_records(columns))
+    records = [r for f in record_files(path) for r in record_io.iter_records(f)]
+    if columns is not None:
+        columns = set(columns)
+        records = [{k: v for k, v in r.items() if k in columns} for r in records]
+    return records
+
+
+# --- CLI ---
+
+def _import(args) -> int:
+    files = args.files
+    store = DatasetStore.create(args.store, [read_batch(path) for path in files])
+    print(f"imported {store.rows} rows from {len(files)} files into {args.store}")
+    return 0
+
+
+def _append(args) -> int:
+    batches = [read_batch(path) for path in args.files]
+    if not DatasetStore.exists(args.store):
+        store = DatasetStore.create(args.store, batches)
+    else:
+        store = DatasetStore(args.store).append(batches, force=args.force)
+    print(f"{args.store}: {store.rows} rows")
+    return 0
+
+
+def _info(args) -> int:
+    store = DatasetStore(args.store)
+    print(f"{args.store}: {store.rows} rows, {len(store.meta['batches'])} batches")
+    for name, column in store.meta["columns"].items():
+        size = sum(os.path.getsize(os.path.join(args.store, f)) for f in os.listdir(args.store)
+                   if f.startswith(name + "."))
+        print(f"  {name:<30} {column['kind']:<9} {column['nulls']:>7} nulls {size / 1024:>9.1f} KB")
+    return 0
+
+
+def _verify(args) -> int:
+    store = DatasetStore(args.store)
+    expected = []
+    for path in args.files:
+        expected.extend({k: v for k, v in r.items() if v is not None} for r in record_io.iter_records(path))
+    got = [{k: v for k, v in r.items() if k != SOURCE_COLUMN} for r in store.iter_records()]
+    differing = sum(a != b for a, b in zip(expected, got)) + abs(len(expected) - len(got))
+    print(f"{len(got)} stored rows, {len(expected)} source rows, {differing} differ")
+    return 1 if differing else 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Columnar store of labeled pages.")
+    parser.add_argument("--store", default=STORE_DIR, help="store directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    import_parser = sub.add_parser("import", help="build the store from JSON exports, replacing it")
+    import_parser.add_argument("files", nargs="+")
+    append_parser = sub.add_parser("append", help="add labeled batches to the store")
+    append_parser.add_argument("files", nargs="+")
+    append_parser.add_argument("--force", action="store_true", help="append files that were already imported")
+    sub.add_parser("info", help="rows, columns, kinds and sizes")
+    verify_parser = sub.add_parser("verify", help="compare the store with its source files")
+    verify_parser.add_argument("files", nargs="+")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    commands = {"import": _import, "append": _append, "info": _info, "verify": _verify}
+    sys.exit(commands[args.command](args))
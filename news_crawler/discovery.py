@@ -0,0 +1,108 @@
+import gzip
+import io
+from datetime import datetime, timezone, timedelta
+from email.utils import parsedate_to_datetime
+from typing import Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from lxml import etree
+
+# Sitemap / RSS / Atom discovery helpers used by UniversalSpider (DISCOVERY_MODE).
+# Documents are parsed incrementally with lxml.iterparse and every processed entry is freed,
+# so large sitemaps never become a full tree in memory.
+
+ENTRY_SITEMAP = "sitemap"   # child of a <sitemapindex>
+ENTRY_URL = "url"           # page listed in a <urlset> or a feed item
+
+DATE_TAGS = ("lastmod", "publication_date", "pubDate", "updated", "published", "date")
+
+
+def sitemaps_from_robots(text: str, base_url: str) -> List[str]:
+    sitemaps = []
+    for line in text.splitlines():
+        key, _, value = line.partition(':')
+        if key.strip().lower() == 'sitemap' and value.strip():
+            sitemaps.append(urljoin(base_url, value.strip()))
+    return sitemaps
+
+
+def parse_date(value: Optional[str]) -> Optional[datetime]:
+    """W3C datetime (sitemaps, Atom) or RFC 822 (RSS) as an aware datetime, None if unparseable."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError, IndexError):
+            return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def as_aware(moment: Optional[datetime]) -> Optional[datetime]:
+    # naive datetimes (news_sites.last_visited) are in the local time of this host
+    if moment is None or moment.tzinfo:
+        return moment
+    return moment.astimezone()
+
+
+def is_newer(lastmod: Optional[datetime], since: Optional[datetime], slack: int = 0) -> bool:
+    """Entries without a date, or with nothing to compare against, are considered new."""
+    if lastmod is None or since is None:
+        return True
+    return lastmod >= as_aware(since) - timedelta(seconds=slack)
+
+
+def _local(tag) -> str:
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+
+def _entry_fields(el) -> Tuple[Optional[str], Optional[str]]:
+    loc, date = None, None
+    for child in el.iter():
+        name = _local(child.tag)
+        if name == 'loc' and loc is None:
+            loc = (child.text or '').strip()
+        elif name == 'link' and loc is None:
+            # RSS <link>url</link>, Atom <link href="url" rel="alternate"/>
+            if child.get('href') and child.get('rel', 'alternate') == 'alternate':
+                loc = child.get('href').strip()
+            elif (child.text or '').strip():
+                loc = child.text.strip()
+        elif name in DATE_TAGS and date is None:
+            date = child.text
+    return loc or None, date
+
+
+def iter_entries(body: bytes) -> Iterator[Tuple[str, str, Optional[datetime]]]:
+    """
+    Yields (kind, url, lastmod) from a sitemap index, url set, RSS or Atom document,
+    gzip-compressed or not. Stops quietly at the first XML error (e.g. an HTML error page).
+    """
+    stream = gzip.GzipFile(fileobj=io.BytesIO(body)) if body[:2] == b'\x1f\x8b' else io.BytesIO(body)
+    depth, index = 0, False
+    try:
+        for event, el in etree.iterparse(stream, events=('start', 'end'), recover=False,
+                                         resolve_entities=False, no_network=True):
+            name = _local(el.tag)
+            if event == 'start':
+                if depth == 0:
+                    index = name == 'sitemapindex'
+                depth += 1
+                continue
+            depth -= 1
+
+            if name in ('url', 'sitemap', 'item', 'entry'):
+                loc, date = _entry_fields(el)
+                if loc:
+                    yield (ENTRY_SITEMAP if index else ENTRY_URL), loc, parse_date(date)
+                # free the processed entry and everything before it
+                el.clear()
+                parent = el.getparent()
+                if parent is not None:
+                    while el.getprevious() is not None:
+                        del parent[0]
+    except (etree.XMLSyntaxError, OSError, EOFError):
+        return
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any
+
+import trafilatura
+
+from boilerplate import BoilerplateEngine, RULES_FILE, DEFAULT_TIMEOUT
+
+# Article extraction (trafilatura + boilerplate.py cleanup), run either inline or in a process pool
+# so the CPU-heavy lxml work does not block the reactor and every other in-flight page.
+
+# Boilerplate engine of this process (built by the worker initializer, or on first inline use)
+_ENGINE: BoilerplateEngine = None
+
+
+def configure(rules_file=RULES_FILE, timeout=DEFAULT_TIMEOUT):
+    global _ENGINE
+    _ENGINE = BoilerplateEngine.from_file(rules_file, timeout=timeout)
+
+
+def engine() -> BoilerplateEngine:
+    if _ENGINE is None:
+        configure()
+    return _ENGINE
+
+
+def _init_worker(rules_file, timeout):
+    # Compile the rules and let trafilatura build its lxml cleaners before the first real page
+    configure(rules_file, timeout)
+    trafilatura.extract("<html><body><article><p>warm up</p></article></body></html>", output_format='json')
+
+
+def extract_article(html, domain):
+    """trafilatura metadata/text of a page plus its cleaned body; runs in a worker or inline."""
+    started = time.perf_counter()
+    extracted_data = {}
+    try:
+        extracted_json = trafilatura.extract(html, output_format='json', include_comments=False)
+        if extracted_json: extracted_data = json.loads(extracted_json)
+    except Exception:
+        pass
+    body, rule_timeouts = engine().clean(extracted_data.get('text', '') or '', domain)
+    return {"data": extracted_data, "body": body, "rule_timeouts": rule_timeouts,
+            "seconds": time.perf_counter() - started}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class ExtractionPool:
+    """
+    Runs extract_article in warm worker processes. At most max_pending extractions are queued
+    or running; further callers wait, which holds their responses in Scrapy's scraper slot and
+    so slows the downloader down (backpressure). workers=0 extracts inline.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 8, rules_file: str = RULES_FILE,
+                 rule_timeout: float = DEFAULT_TIMEOUT):
+        self.workers = workers
+        self.max_pending = max(1, max_pending)
+        self.rules_file = rules_file
+        self.rule_timeout = rule_timeout
+        self.rule_timeouts = 0
+        self.executor = None
+        self.semaphore = None
+        # queue depth = extractions submitted to the workers + callers waiting for a slot
+        self.in_flight = 0
+        self.waiting = 0
+        self.queue_depth_max = 0
+        self.latencies = deque(maxlen=10000)
+        self.waits = deque(maxlen=10000)
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            workers=settings.getint('EXTRACTION_WORKERS', 2),
+            max_pending=settings.getint('EXTRACTION_MAX_PENDING', 8),
+            rule_timeout=settings.getfloat('BOILERPLATE_RULE_TIMEOUT', DEFAULT_TIMEOUT),
+        )
+
+    def _start(self):
+        if self.workers > 0 and multiprocessing.current_process().daemon:
+            # daemonic processes (multiprocessing.Pool workers) cannot have children
+            sys.stderr.write("Warning: extraction pool unavailable in a daemonic process, extracting inline\n")
+            self.workers = 0
+        if self.workers > 0:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=_init_worker,
+                                                initargs=(self.rules_file, self.rule_timeout))
+        else:
+            configure(self.rules_file, self.rule_timeout)
+        self.semaphore = asyncio.Semaphore(self.max_pending)
+
+    async def extract(self, html, domain) -> Dict[str, Any]:
+        if self.semaphore is None:
+            self._start()
+        if self.executor is None:
+            result = extract_article(html, domain)
+            self.latencies.append(result["seconds"])
+            self.rule_timeouts += result["rule_timeouts"]
+            return result
+
+        queued = time.perf_counter()
+        self.waiting += 1
+        self.queue_depth_max = max(self.queue_depth_max, self.in_flight + self.waiting)
+        async with self.semaphore:
+            self.waiting -= 1
+            self.waits.append(time.perf_counter() - queued)
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wrap_future(self.executor.submit(extract_article, html, domain))
+                self.rule_timeouts += result["rule_timeouts"]
+                return result
+            finally:
+                self.in_flight -= 1
+                self.latencies.append(time.perf_counter() - started)
+
+    def report(self) -> Dict[str, Any]:
+        latencies, waits = list(self.latencies), list(self.waits)
+        return {
+            "workers": self.workers,
+            "extractions": len(latencies),
+            "queue_depth_max": self.queue_depth_max,
+            "latency_p50": round(percentile(latencies, 50), 4),
+            "latency_p90": round(percentile(latencies, 90), 4),
+            "latency_p99": round(percentile(latencies, 99), 4),
+            "backpressure_wait_p90": round(percentile(waits, 90), 4),
+            "boilerplate_rule_timeouts": self.rule_timeouts,
+        }
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,189 @@
+import argparse
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+# Page classifier features, computed the same way for training (scripts/train_classifier.py),
+# offline prediction (scripts/predict_new_site.py) and in-crawl classification (ClassificationPipeline),
+# column-wise over whole batches.
+#
+#   python features.py parity    vectorized vs. row-wise features, and vs. the columns stored in data/store
+#   python features.py bench     rows/sec of both implementations
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.path.join(BASE_DIR, "data", "store")
+
+# CRITICAL: the column order the saved model was trained with
+REQUIRED_FEATURES = [
+    "url_length", "url_depth", "title_length", "text_length", "text_density",
+    "has_date_pattern_in_url", "xpath_depth", "xpath_contains_article",
+    "xpath_contains_main_content", "xpath_contains_story", "is_article_in_category"
+]
+XPATH_FEATURES = ["xpath_depth", "xpath_contains_article", "xpath_contains_main_content", "xpath_contains_story"]
+# Record fields the features are computed from
+INPUT_COLUMNS = REQUIRED_FEATURES + ["xpath", "source_xpath"]
+
+# Substring matches, as used when the shipped model was trained. The older word-boundary variant
+# (\barticle\b, ...) agrees on every path in data/store (see parity), since getpath() paths hold only tag names.
+XPATH_PATTERNS = {
+    "xpath_contains_article": r"article",
+    "xpath_contains_main_content": r"main|content",
+    "xpath_contains_story": r"story",
+}
+WORD_BOUNDARY_PATTERNS = {
+    "xpath_contains_article": r"\barticle\b",
+    "xpath_contains_main_content": r"\b(?:main|content)\b",
+    "xpath_contains_story": r"\bstory\b",
+}
+
+# Stored datasets hold booleans as strings ("True") and missing xpaths as "None"
+TEXT_VALUES = {'True': 1, 'False': 0, 'true': 1, 'false': 0, 'None': np.nan, '': np.nan}
+
+
+def get_xpath_features(xpath):
+    """Row-wise reference implementation, kept for single records and the parity check."""
+    data = {'xpath_depth': 0, 'xpath_contains_article': 0, 'xpath_contains_main_content': 0, 'xpath_contains_story': 0}
+    if xpath and isinstance(xpath, str):
+        data['xpath_depth'] = xpath.count('/')
+        for name, pattern in XPATH_PATTERNS.items():
+            if re.search(pattern, xpath, re.I): data[name] = 1
+    return data
+
+
+def xpath_column(df: pd.DataFrame) -> str:
+    # 'xpath' whenever the column exists, the listing anchor's path otherwise
+    return 'xpath' if 'xpath' in df.columns else 'source_xpath'
+
+
+def xpath_features(xpaths: pd.Series, patterns: Dict[str, str] = XPATH_PATTERNS) -> pd.DataFrame:
+    """
+    XPATH_FEATURES of a column of paths; anything that is not a string counts as no path.
+    Pages of one site share a handful of layouts, so the features are computed once per distinct
+    path and scattered back to the rows with a NumPy take.
+    """
+    paths = xpaths.where(xpaths.map(type) == str)
+    codes, uniques = pd.factorize(paths, use_na_sentinel=True)
+    distinct = pd.Series(uniques, dtype="string")
+    table = np.zeros((len(distinct) + 1, len(XPATH_FEATURES)))   # last row: no path (code -1)
+    table[:-1, 0] = distinct.str.count('/').to_numpy(dtype=float)
+    for i, name in enumerate(XPATH_FEATURES[1:], 1):
+        table[:-1, i] = distinct.str.contains(patterns[name], flags=re.I, regex=True).to_numpy(dtype=float)
+    return pd.DataFrame(table[codes], index=xpaths.index, columns=XPATH_FEATURES)
+
+
+def as_numeric(column: pd.Series) -> pd.Series:
+    if column.dtype == object:
+        column = column.replace(TEXT_VALUES)
+    return pd.to_numeric(column, errors='coerce').astype(float).fillna(0.0)
+
+
+def build_features(data: Union[pd.DataFrame, List[Dict[str, Any]]]) -> pd.DataFrame:
+    """Float frame of REQUIRED_FEATURES; xpath features are always recomputed from the path column."""
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    out = pd.DataFrame(index=df.index)
+    for name in REQUIRED_FEATURES:
+        if name not in XPATH_FEATURES:
+            out[name] = as_numeric(df[name]) if name in df.columns else 0.0
+    column = xpath_column(df)
+    paths = df[column] if column in df.columns else pd.Series([None] * len(df), index=df.index, dtype=object)
+    out[XPATH_FEATURES] = xpath_features(paths)
+    return out[REQUIRED_FEATURES]
+
+
+# --- parity / bench ---
+
+def legacy_features(records: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Previous per-row path: a dict per record through get_xpath_features, concatenated back."""
+    df = pd.DataFrame(records)
+    column = xpath_column(df)
+    xpath_data = df[column].apply(lambda x: get_xpath_features(x if isinstance(x, str) else "")) \
+        if column in df.columns else pd.Series([get_xpath_features("")] * len(df))
+    df = pd.concat([df.drop(columns=[c for c in XPATH_FEATURES if c in df.columns]).reset_index(drop=True),
+                    pd.DataFrame(xpath_data.tolist())], axis=1)
+    for col in REQUIRED_FEATURES:
+        if col not in df.columns: df[col] = 0
+    return df[REQUIRED_FEATURES].apply(lambda c: c.map(_reference_number)).astype(float).fillna(0)
+
+
+def _reference_number(value):
+    if isinstance(value, str):
+        value = TEXT_VALUES.get(value, value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def load_records(path: str) -> List[Dict[str, Any]]:
+    """The feature inputs of a dataset store (or a directory of JSON exports); no article bodies."""
+    try:
+        from .dataset_store import load_records as load_dataset_records
+    except ImportError:
+        from dataset_store import load_records as load_dataset_records
+    return load_dataset_records(path, INPUT_COLUMNS + ["label"])
+
+
+def mismatches(left: pd.DataFrame, right: pd.DataFrame) -> Dict[str, int]:
+    diff = ~np.isclose(left.to_numpy(dtype=float), right.to_numpy(dtype=float))
+    return {name: int(count) for name, count in zip(left.columns, diff.sum(axis=0)) if count}
+
+
+def parity(args):
+    records = load_records(args.data)
+    df = pd.DataFrame(records)
+    failures = 0
+
+    # 1. serving: the vectorized features equal the row-wise reference
+    diff = mismatches(build_features(df), legacy_features(records))
+    print(f"vectorized vs row-wise ({len(df)} rows): {diff or 'identical'}")
+    failures += bool(diff)
+
+    # 2. training/serving skew: recomputed xpath features equal the precomputed columns of the dataset
+    stored = [c for c in XPATH_FEATURES if c in df.columns]
+    if stored:
+        diff = mismatches(build_features(df)[stored], df[stored].apply(as_numeric))
+        print(f"recomputed vs stored xpath features: {diff or 'identical'}")
+        failures += bool(diff)
+
+    # 3. informational: the word-boundary regex variant
+    paths = df[xpath_column(df)] if xpath_column(df) in df.columns else pd.Series(dtype=object)
+    diff = mismatches(xpath_features(paths), xpath_features(paths, WORD_BOUNDARY_PATTERNS))
+    print(f"substring vs word-boundary patterns: {diff or 'identical'}")
+    return 1 if failures else 0
+
+
+def bench(args):
+    records = load_records(args.data) * args.repeat
+    df = pd.DataFrame(records)
+    print(f"{len(records)} rows")
+    # both start from the records a predictor receives; the vectorized path from the frame built once
+    for name, fn, data in (("row-wise", legacy_features, records), ("vectorized", build_features, df)):
+        best = float('inf')
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            fn(data)
+            best = min(best, time.perf_counter() - started)
+        print(f"{name:<11} {best * 1000:>9.1f} ms  {len(records) / best:>12,.0f} rows/sec")
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Classifier feature tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    parity_parser = sub.add_parser("parity", help="check that training and serving compute the same features")
+    parity_parser.add_argument("--data", default=STORE_DIR, help="dataset store, or a directory of JSON exports")
+    bench_parser = sub.add_parser("bench", help="rows/sec of the row-wise and vectorized features")
+    bench_parser.add_argument("--data", default=STORE_DIR, help="dataset store, or a directory of JSON exports")
+    bench_parser.add_argument("--repeat", type=int, default=10, help="replicate the data N times")
+    bench_parser.add_argument("--rounds", type=int, default=3, help="best of N timings")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    sys.exit(parity(args) if args.command == "parity" else bench(args))
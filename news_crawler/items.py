@@ -10,6 +10,7 @@ class PageItem(scrapy.Item):
     # --- Identification & Metadata ---
     url = scrapy.Field()
     filename = scrapy.Field()
+    site_id = scrapy.Field()
 
     # --- Extracted Content ---
     title = scrapy.Field()
@@ -24,11 +25,15 @@ class PageItem(scrapy.Item):
 
     xpath = scrapy.Field()
     source_xpath = scrapy.Field()
+    anchor_text = scrapy.Field()
 
     has_date_pattern_in_url = scrapy.Field()
     is_category_link = scrapy.Field()
+    link_category = scrapy.Field()  # categories.yml category whose keyword matched the URL
 
     has_trafilatura_meta = scrapy.Field()
 
     is_article_in_category = scrapy.Field()
 
+    # --- Classification (filled by ClassificationPipeline when CLASSIFY_DURING_CRAWL) ---
+    predicted_label = scrapy.Field()
@@ -0,0 +1,68 @@
+import re
+from typing import Dict, Iterable, Optional
+
+# URL keyword matching for UniversalSpider.schedule_link: all keywords of a list are compiled into
+# one pattern, so every link is scanned once instead of once per keyword. The pattern is factored
+# as a trie (shared prefixes are tried once); a flat alternation of the same keywords is slower
+# with the re module than the plain any(kw in url) loop it replaces.
+
+GENERAL_CATEGORY = "general"
+
+
+def trie_pattern(keywords: Iterable[str]) -> str:
+    """Regex matching any of the keywords, preferring the longest one at a position."""
+    trie: dict = {}
+    for kw in keywords:
+        node = trie
+        for ch in kw:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # a keyword ends here: the longer keywords continuing from it are optional
+        return f"(?:{body})?" if '' in node else body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Substring matcher over lowercased text. Each keyword maps to a label; match() returns the
+    label of the leftmost keyword found (the longest one when several start at the same position).
+    """
+
+    def __init__(self, labels: Dict[str, str]):
+        self.labels = labels
+        self.pattern = re.compile(trie_pattern(labels)) if labels else None
+
+    @classmethod
+    def from_keywords(cls, keywords: Iterable[str], label: str = ""):
+        return cls({kw.lower(): label for kw in keywords if kw})
+
+    @classmethod
+    def from_categories(cls, config: dict):
+        """categories.yml: one label per category; a keyword listed twice keeps its first category."""
+        labels: Dict[str, str] = {}
+        for category, entry in (config.get('categories') or {}).items():
+            for kw in (entry or {}).get('keywords', []):
+                labels.setdefault(str(kw).lower(), category)
+        for kw in config.get('general_category_keywords') or []:
+            labels.setdefault(str(kw).lower(), GENERAL_CATEGORY)
+        return cls(labels)
+
+    def match(self, text: str) -> Optional[str]:
+        """Label of the matched keyword, None if no keyword occurs in text."""
+        if self.pattern is None:
+            return None
+        found = self.pattern.search(text)
+        return self.labels[found.group(0)] if found else None
+
+    def matches(self, text: str) -> bool:
+        return self.pattern is not None and self.pattern.search(text) is not None
+
+    def __len__(self):
+        return len(self.labels)
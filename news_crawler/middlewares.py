@@ -3,11 +3,20 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import json
+import os
+import time
+
 from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
 
+from .browser_pool import BrowserPool
+
 
 class News_crawlerSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
@@ -57,47 +66,194 @@ class News_crawlerSpiderMiddleware:
 
 
 class News_crawlerDownloaderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the downloader middleware does not modify the
-    # passed objects.
+    """
+    Conditional-GET cache for recrawls. Plain HTTP responses that carry an ETag or Last-Modified
+    are stored on disk (cache/http) by request fingerprint. On the next fetch the request is sent
+    with If-None-Match / If-Modified-Since, and a 304 is answered with the stored body.
+    Playwright requests are not revalidated, since a rendered page has no validators of its own.
+    """
+
+    def __init__(self, cache_dir, fingerprinter, stats):
+        self.cache_dir = cache_dir
+        self.fingerprinter = fingerprinter
+        self.stats = stats
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
+        settings = crawler.settings
+        if not settings.getbool("CONDITIONAL_CACHE_ENABLED"):
+            raise NotConfigured
+        s = cls(settings.get("CONDITIONAL_CACHE_DIR", "cache/http"), crawler.request_fingerprinter, crawler.stats)
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
         return s
 
+    def _cacheable(self, request):
+        return (request.method == "GET" and not request.meta.get("playwright")
+                and not request.meta.get("dont_cache"))
+
+    def _paths(self, request):
+        key = self.fingerprinter.fingerprint(request).hex()
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return f"{base}.json", f"{base}.body"
+
+    def _load_entry(self, meta_path):
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, request, response):
+        meta_path, body_path = self._paths(request)
+        entry = {
+            "url": response.url,
+            "etag": response.headers.get("ETag", b"").decode("latin-1") or None,
+            "last_modified": response.headers.get("Last-Modified", b"").decode("latin-1") or None,
+            "content_type": response.headers.get("Content-Type", b"").decode("latin-1") or None,
+            "stored_at": time.time(),
+        }
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        # body first: an entry is only visible once both files are complete
+        body_tmp, meta_tmp = f"{body_path}.{os.getpid()}.tmp", f"{meta_path}.{os.getpid()}.tmp"
+        with open(body_tmp, "wb") as f:
+            f.write(response.body)
+        os.replace(body_tmp, body_path)
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(meta_tmp, meta_path)
+        self.stats.inc_value("http_cache/stored")
+
     def process_request(self, request, spider):
-        # Called for each request that goes through the downloader
-        # middleware.
-
-        # Must either:
-        # - return None: continue processing this request
-        # - or return a Response object
-        # - or return a Request object
-        # - or raise IgnoreRequest: process_exception() methods of
-        #   installed downloader middleware will be called
+        if not self._cacheable(request):
+            return None
+        entry = self._load_entry(self._paths(request)[0])
+        if entry is None:
+            self.stats.inc_value("http_cache/miss")
+            return None
+
+        if entry.get("etag"):
+            request.headers.setdefault("If-None-Match", entry["etag"])
+        if entry.get("last_modified"):
+            request.headers.setdefault("If-Modified-Since", entry["last_modified"])
+        request.meta["http_cache_entry"] = entry
         return None
 
     def process_response(self, request, response, spider):
-        # Called with the response returned from the downloader.
+        entry = request.meta.pop("http_cache_entry", None)
+        if entry is not None and response.status == 304:
+            try:
+                with open(self._paths(request)[1], "rb") as f:
+                    body = f.read()
+            except OSError:
+                # stored body vanished: fetch again without validators
+                self.stats.inc_value("http_cache/body_missing")
+                retry = request.replace(dont_filter=True)
+                retry.headers.pop("If-None-Match", None)
+                retry.headers.pop("If-Modified-Since", None)
+                retry.meta["dont_cache"] = True
+                return retry
+            self.stats.inc_value("http_cache/hit")
+            request.meta["http_cache_hit"] = True
+            headers = Headers({"Content-Type": entry["content_type"]} if entry.get("content_type") else {})
+            respcls = responsetypes.from_args(headers=headers, url=entry.get("url") or request.url, body=body)
+            return respcls(url=entry.get("url") or request.url, status=200, headers=headers, body=body,
+                           request=request, flags=["cached"])
 
-        # Must either;
-        # - return a Response object
-        # - return a Request object
-        # - or raise IgnoreRequest
+        if entry is not None:
+            self.stats.inc_value("http_cache/revalidate")
+        if (response.status == 200 and self._cacheable(request)
+                and (b"ETag" in response.headers or b"Last-Modified" in response.headers)):
+            try:
+                self._store(request, response)
+            except OSError as e:
+                spider.logger.warning(f"HTTP cache write failed for {request.url}: {e}")
         return response
 
-    def process_exception(self, request, exception, spider):
-        # Called when a download handler or a process_request()
-        # (from other downloader middleware) raises an exception.
-
-        # Must either:
-        # - return None: continue processing this exception
-        # - return a Response object: stops process_exception() chain
-        # - return a Request object: stops process_exception() chain
-        pass
-
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+    def spider_closed(self, spider):
+        # hit: 304 served from disk, revalidate: validators sent but the page changed, miss: no entry
+        counts = {k: self.stats.get_value(f"http_cache/{k}", 0) for k in ("hit", "revalidate", "miss")}
+        total = sum(counts.values())
+        ratios = {k: round(v / total, 3) if total else 0.0 for k, v in counts.items()}
+        spider.logger.info(f"HTTP cache: {counts} ratios {ratios}")
+
+
+class CrawlBudgetMiddleware:
+    """
+    Drops page requests of domains whose page/time budget (spider.crawl_budget, see crawl_budget.py)
+    is spent. Homepage and discovery requests are never charged; a page re-queued for rendering
+    is charged once.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not (settings.getint("CRAWL_DOMAIN_MAX_PAGES", 0) or settings.getfloat("CRAWL_DOMAIN_MAX_SECONDS", 0)):
+            raise NotConfigured
+        return cls(crawler.stats)
+
+    def process_request(self, request, spider):
+        budget = getattr(spider, "crawl_budget", None)
+        domain = request.meta.get("site_domain")
+        if budget is None or not domain or not request.meta.get("crawl_depth") or request.meta.get("budget_charged"):
+            return None
+        if not budget.charge(domain):
+            self.stats.inc_value(f"domain/{domain}/budget_dropped")
+            raise IgnoreRequest(f"Crawl budget of {domain} spent")
+        request.meta["budget_charged"] = True
+        return None
+
+
+class BrowserPoolMiddleware:
+    """
+    Downloader middleware that runs Playwright requests on warm, pooled pages.
+    Pages are returned to the pool as soon as the response is downloaded, since
+    callbacks only read the response body.
+    """
+
+    def __init__(self, pool, stats):
+        self.pool = pool
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("BROWSER_POOL_ENABLED"):
+            raise NotConfigured
+        pool = BrowserPool(
+            max_idle_pages=settings.getint("BROWSER_POOL_MAX_IDLE_PAGES", 4),
+            context_max_pages=settings.getint("BROWSER_POOL_CONTEXT_MAX_PAGES", 200),
+            rss_limit_mb=settings.getint("BROWSER_POOL_RSS_LIMIT_MB", 1500),
+            rss_check_interval=settings.getint("BROWSER_POOL_RSS_CHECK_INTERVAL", 20),
+            context_kwargs=settings.getdict("PLAYWRIGHT_CONTEXTS").get("default", {}),
+            stats=crawler.stats,
+        )
+        s = cls(pool, crawler.stats)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    async def process_request(self, request, spider):
+        if request.meta.get("playwright"):
+            await self.pool.acquire(request)
+        return None
+
+    async def process_response(self, request, response, spider):
+        await self.pool.release(request)
+        return response
+
+    async def process_exception(self, request, exception, spider):
+        # A failed navigation may leave the page in a broken state, so it is not reused
+        await self.pool.release(request, reusable=False)
+        return None
+
+    def spider_closed(self, spider):
+        report = self.pool.report()
+        for key, value in report.items():
+            self.stats.set_value(f"browser_pool/{key}", value)
+        spider.logger.info(f"Browser pool: {report}")
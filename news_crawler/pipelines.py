@@ -1,42 +1,228 @@
-import json
+import asyncio
 import os
 import sys
+import time
+from collections import Counter, defaultdict
+
+from scrapy.exceptions import NotConfigured
+
 # Import the database logic from database_manager module
-from .database_manager import save_article
+from .database_manager import ArticleWriter, pool_stats, STATUS_NEW, STATUS_UPDATED, STATUS_UNCHANGED
+from .classifier import LinkClassifier
+from .record_io import RecordWriter
+from . import crawl_stats
+
+
+class ClassificationPipeline:
+    """
+    Labels items (article / category / other) while the crawl is running, replacing the
+    separate predict_new_site.py pass over the raw output. Items are classified in micro-batches:
+    a batch is flushed when it is full or when its oldest item has waited CLASSIFIER_BATCH_MAX_DELAY.
+    """
+
+    def __init__(self, batch_size: int = 32, max_delay: float = 1.0, stats=None):
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max_delay
+        self.stats = stats
+        self.classifier = None
+        self.pending = []
+        self.flush_timer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('CLASSIFY_DURING_CRAWL', False):
+            raise NotConfigured
+        return cls(
+            batch_size=settings.getint('CLASSIFIER_BATCH_SIZE', 32),
+            max_delay=settings.getfloat('CLASSIFIER_BATCH_MAX_DELAY', 1.0),
+            stats=crawler.stats,
+        )
+
+    def open_spider(self, spider):
+        try:
+            self.classifier = LinkClassifier.load()
+        except Exception as e:
+            # Items pass through unlabelled and the runner falls back to predict_new_site.py
+            spider.logger.error(f"Classifier could not be loaded, skipping in-crawl classification: {e}")
+
+    def close_spider(self, spider):
+        self.flush(spider)
+
+    async def process_item(self, item, spider):
+        if self.classifier is None:
+            return item
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((item, future))
+        if len(self.pending) >= self.batch_size:
+            self.flush(spider)
+        elif self.flush_timer is None:
+            self.flush_timer = asyncio.get_running_loop().call_later(self.max_delay, self.flush, spider)
+        await future
+        return item
+
+    def flush(self, spider):
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        try:
+            labels = self.classifier.predict_records([dict(item) for item, _ in batch])
+        except Exception as e:
+            spider.logger.error(f"Classification of {len(batch)} items failed: {e}")
+            labels = [None] * len(batch)
+        elapsed = time.perf_counter() - started
+
+        for (item, future), label in zip(batch, labels):
+            if label is not None:
+                item['predicted_label'] = str(label)
+            if self.stats:
+                # batch cost shared equally, so it can be reported per output file
+                self.stats.inc_value(f"classifier/seconds/{item.get('filename')}", elapsed / len(batch))
+            if not future.done():
+                future.set_result(label)
+
+        if self.stats:
+            self.stats.inc_value("classifier/batches")
+            self.stats.inc_value("classifier/items", len(batch))
+            self.stats.max_value("classifier/max_batch_size", len(batch))
+
 
 class MySQLPipeline:
     """
     Pipeline responsible for filtering items and persisting 'article' data into MySQL.
     It implements the core business logic of storing only valid news content.
+    Buffered articles are flushed when the batch is full or, through a timer, once the oldest
+    one has waited ARTICLE_WRITE_MAX_DELAY, even if no further article arrives.
     """
 
+    def __init__(self, batch_size: int = 100, max_delay: float = 5.0, stats=None):
+        self.stats = stats
+        self.max_delay = max_delay
+        self.flush_timer = None
+        # Articles are written in batches; status counts are kept per output file by the writer
+        self.writer = ArticleWriter(batch_size=batch_size, max_delay=max_delay)
+        # Per output file: label distribution and DB time
+        self.labels = defaultdict(Counter)
+        self.db_seconds = defaultdict(float)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            batch_size=settings.getint('ARTICLE_WRITE_BATCH_SIZE', 100),
+            max_delay=settings.getfloat('ARTICLE_WRITE_MAX_DELAY', 5.0),
+            stats=crawler.stats,
+        )
+
     def process_item(self, item, spider):
+        filename = item.get('filename')
+        if item.get('predicted_label') is not None:
+            self.labels[filename][item['predicted_label']] += 1
+
         # only process items predicted as 'article'
         if item.get('predicted_label') == 'article':
+            started = time.perf_counter()
             try:
                 # Default site_id to 1 if not provided
-                site_id = item.get('site_id', 1)
+                site_id = item.get('site_id') or 1
 
-                # Invoke save_article to handle deduplication (MD5) and DB insertion
-                save_article(
+                # Buffered; MD5 deduplication and DB insertion happen when the batch is flushed
+                self.writer.add(
                     site_id=site_id,
                     url=item.get('url'),
                     title=item.get('title'),
                     body=item.get('article_body'),
-                    image_url=item.get('image_urls')[0] if item.get('image_urls') else None
+                    image_url=item.get('image_urls')[0] if item.get('image_urls') else None,
+                    key=filename
                 )
             except Exception as e:
                 # Log errors to Scrapy console for troubleshooting (e.g., connection issues)
                 spider.logger.error(f"MySQL Pipeline Error: {e}")
+            self.db_seconds[filename] += time.perf_counter() - started
+
+            if not self.writer.buffer:
+                self.cancel_flush_timer()
+            elif self.flush_timer is None:
+                self.flush_timer = asyncio.get_running_loop().call_later(self.max_delay, self.flush, spider)
 
         return item
 
+    def cancel_flush_timer(self):
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+
+    def flush(self, spider):
+        """Timer flush: writes what a quiet domain left in the buffer."""
+        self.flush_timer = None
+        filenames = {row['key'] for row in self.writer.buffer.values()}
+        started = time.perf_counter()
+        try:
+            self.writer.flush()
+        except Exception as e:
+            spider.logger.error(f"MySQL Pipeline Error: {e}")
+        elapsed = time.perf_counter() - started
+        for filename in filenames:
+            self.db_seconds[filename] += elapsed
+
+    def close_spider(self, spider):
+        self.cancel_flush_timer()
+        started = time.perf_counter()
+        self.writer.close()
+        flush_seconds = time.perf_counter() - started
+        spider.logger.info(f"Article writer: {self.writer.flushes} batch flushes, "
+                           f"{self.writer.snapshot_rows} preloaded URLs, DB pool: {pool_stats()}")
+
+        # Publishes the same "prediction" section as predict_new_site.py, so the runner can skip it
+        for filename, labels in self.labels.items():
+            if not filename:
+                continue
+            # the final flush is shared by every file, charged to each of them
+            self.db_seconds[filename] += flush_seconds
+            db_ops = self.writer.counts[filename]
+            classify_seconds = self.stats.get_value(f"classifier/seconds/{filename}", 0.0) if self.stats else 0.0
+            prediction_section = {
+                "rows": sum(labels.values()),
+                "labels": dict(labels),
+                "db": {
+                    "new": db_ops[STATUS_NEW],
+                    "updated": db_ops[STATUS_UPDATED],
+                    "unchanged": db_ops[STATUS_UNCHANGED],
+                    "errors": db_ops["errors"],
+                    "skipped_unknown_site": 0,
+                },
+                "timings": {"predict": round(classify_seconds, 3), "db": round(self.db_seconds[filename], 3)},
+                "in_crawl": True,
+            }
+            try:
+                crawl_stats.write_stats_section(crawl_stats.stats_path_for(filename), "prediction",
+                                                prediction_section)
+            except Exception as e:
+                spider.logger.error(f"Could not write prediction stats for {filename}: {e}")
+
 class CustomJsonPipeline:
     """
-    Backup pipeline that stores all crawled items into individual JSON files
-    within the 'results/' directory, structured by domain.
+    Backup pipeline that stores all crawled items into one record file per domain
+    within the 'results/' directory (format from the filename, see record_io / OUTPUT_FORMAT).
     """
 
+    def __init__(self, flush_items=50, flush_seconds=10.0):
+        self.flush_items = flush_items
+        self.flush_seconds = flush_seconds
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            flush_items=crawler.settings.getint('OUTPUT_FLUSH_ITEMS', 50),
+            flush_seconds=crawler.settings.getfloat('OUTPUT_FLUSH_SECONDS', 10.0),
+        )
+
     def open_spider(self, spider):
         # Ensure the results directory exists before writing
         os.makedirs('results', exist_ok=True)
@@ -44,10 +230,8 @@ class CustomJsonPipeline:
 
     def close_spider(self, spider):
         # Finalize and close all open file handles when the spider finishes
-        for file_info in self.files.values():
-            f = file_info['file']
-            f.write('\n]')
-            f.close()
+        for writer in self.files.values():
+            writer.close()
 
     def process_item(self, item, spider):
         # Determine the target filename from the item metadata
@@ -57,22 +241,11 @@ class CustomJsonPipeline:
 
         # Initialize the file if it hasn't been opened in this session
         if filename not in self.files:
-            file = open(filename, 'w', encoding='utf-8')
-            file.write('[')
-            self.files[filename] = {'file': file, 'first_item': True}
-
-        file_info = self.files[filename]
+            self.files[filename] = RecordWriter(filename, self.flush_items, self.flush_seconds)
 
         # Create a shallow copy of the item to avoid altering the data for other pipelines
         temp_item = dict(item)
         temp_item.pop('filename', None) # Remove 'filename' key from the output JSON
 
-        # Handle JSON comma separation logic
-        if not file_info['first_item']:
-            file_info['file'].write(',\n')
-
-        # dump the item content to the file with UTF-8 support
-        json.dump(temp_item, file_info['file'], ensure_ascii=False, indent=2)
-
-        file_info['first_item'] = False
-        return item
\ No newline at end of file
+        self.files[filename].write(temp_item)
+        return item
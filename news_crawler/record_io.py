@@ -0,0 +1,171 @@
+import gzip
+import io
+import json
+import os
+import sys
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional
+
+# Record files exchanged between the crawl (CustomJsonPipeline) and the prediction step.
+# JSON Lines (one compact object per line), optionally gzip or zstd compressed, is written
+# incrementally and read back in fixed-size chunks; a crawl that dies mid-write still leaves
+# every flushed record readable. The legacy pretty-printed array (".json") is still readable.
+
+FORMAT_SUFFIXES = {
+    "json": ".json",
+    "jsonl": ".jsonl",
+    "jsonl.gz": ".jsonl.gz",
+    "jsonl.zst": ".jsonl.zst",
+}
+# Lookup order when a file is located by stem (compressed and line formats first)
+SEARCH_SUFFIXES = (".jsonl.zst", ".jsonl.gz", ".jsonl", ".json")
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def output_suffix(fmt: str) -> str:
+    if fmt not in FORMAT_SUFFIXES:
+        raise ValueError(f"Unknown OUTPUT_FORMAT: {fmt} (expected one of {', '.join(FORMAT_SUFFIXES)})")
+    return FORMAT_SUFFIXES[fmt]
+
+
+def split_suffix(path: str):
+    """(stem, suffix) of a record file: results/raw_x.jsonl.gz -> (results/raw_x, .jsonl.gz)."""
+    for suffix in SEARCH_SUFFIXES:
+        if path.endswith(suffix):
+            return path[:-len(suffix)], suffix
+    return path, ""
+
+
+def find_output(stem: str) -> Optional[str]:
+    """Existing record file for a stem (results/raw_x), whatever format the crawl was configured with."""
+    for suffix in SEARCH_SUFFIXES:
+        if os.path.exists(stem + suffix):
+            return stem + suffix
+    return None
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstd record files need the 'zstandard' package (pip install zstandard)")
+    return zstandard
+
+
+class RecordWriter:
+    """
+    Appends records to one file. Buffered output is flushed every flush_items records or
+    flush_seconds seconds (compressed streams with a sync flush, so the data is decodable).
+    """
+
+    def __init__(self, path: str, flush_items: int = 50, flush_seconds: float = 10.0):
+        self.path = path
+        self.suffix = split_suffix(path)[1]
+        self.flush_items = flush_items
+        self.flush_seconds = flush_seconds
+        self.count = 0
+        self.pending = 0
+        self.last_flush = time.monotonic()
+        self._raw = None
+        self._compressor = None
+        if self.suffix == ".jsonl.gz":
+            self._file = gzip.open(path, 'wt', encoding='utf-8')
+        elif self.suffix == ".jsonl.zst":
+            self._raw = open(path, 'wb')
+            self._compressor = _zstd().ZstdCompressor().stream_writer(self._raw)
+            self._file = io.TextIOWrapper(self._compressor, encoding='utf-8')
+        else:
+            self._file = open(path, 'w', encoding='utf-8')
+            if self.suffix == ".json":
+                self._file.write('[')
+
+    def write(self, record: Dict[str, Any]):
+        if self.suffix == ".json":
+            # legacy array output, as CustomJsonPipeline used to write it
+            self._file.write(',\n' if self.count else '\n')
+            json.dump(record, self._file, ensure_ascii=False, indent=2)
+        else:
+            self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+            self._file.write('\n')
+        self.count += 1
+        self.pending += 1
+        if self.pending >= self.flush_items or time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        if self.suffix == ".jsonl.gz":
+            self._file.buffer.flush(zlib.Z_SYNC_FLUSH)
+        elif self._compressor is not None:
+            self._compressor.flush(_zstd().FLUSH_BLOCK)
+            self._raw.flush()
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        if self.suffix == ".json":
+            self._file.write('\n]')
+        self._file.close()
+        if self._raw is not None and not self._raw.closed:
+            self._raw.close()
+
+
+def _truncation_errors(suffix: str):
+    if suffix == ".jsonl.zst":
+        return EOFError, OSError, _zstd().ZstdError
+    return EOFError, OSError
+
+
+def _open_text(path: str):
+    suffix = split_suffix(path)[1]
+    if suffix == ".jsonl.gz":
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if suffix == ".jsonl.zst":
+        return io.TextIOWrapper(_zstd().ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True),
+                                encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Records of a file one at a time. A truncated tail (unterminated line, compressed stream
+    without its trailer) ends the iteration with a warning instead of an error.
+    """
+    if split_suffix(path)[1] == ".json":
+        # the legacy array has to be parsed as a whole
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+        return
+
+    truncated = _truncation_errors(split_suffix(path)[1])
+    with _open_text(path) as f:
+        line_no = 0
+        try:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    sys.stderr.write(f"Warning: skipping unreadable record {path}:{line_no}\n")
+        except truncated as e:
+            sys.stderr.write(f"Warning: {path} is truncated after line {line_no}: {e}\n")
+
+
+def iter_chunks(path: str, size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """Records in lists of at most size, so a consumer holds one chunk at a time."""
+    chunk = []
+    for record in iter_records(path):
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def count_records(path: str) -> int:
+    return sum(1 for _ in iter_records(path))
@@ -0,0 +1,141 @@
+import json
+import os
+import re
+import sys
+from typing import Dict, Any
+
+# Rendering decisions per domain
+DECISION_PROBE = "probe"
+DECISION_HTTP = "http"
+DECISION_BROWSER = "browser"
+
+RENDER_MODES = ("playwright", "http", "hybrid")
+
+# Markers of client-side rendered shells (empty app roots, JavaScript-required notices)
+JS_SHELL_PATTERN = re.compile(
+    r"<(div|main)\b[^>]*\bid=[\"'](?:root|app|__next|__nuxt)[\"'][^>]*>\s*</\1>"
+    r"|<app-root\b[^>]*>\s*</app-root>"
+    r"|<noscript\b[^>]*>[^<]*(?:enable javascript|javascript is required|ενεργοποιήστε (?:τη |το )?javascript)",
+    re.IGNORECASE,
+)
+
+
+def looks_like_js_shell(html: str) -> bool:
+    # Detects pages whose content is only produced by JavaScript
+    return bool(html and JS_SHELL_PATTERN.search(html))
+
+
+class RenderPolicy:
+    """
+    Decides per domain whether pages are fetched with plain HTTP or rendered with Playwright.
+    In hybrid mode every domain starts in 'probe': pages are fetched over HTTP and escalated
+    to Playwright when they look JavaScript-only. The outcome of the escalations settles
+    the domain on either HTTP or browser rendering, and the decision is cached on disk.
+    """
+
+    def __init__(self, mode: str = "hybrid", min_text_length: int = 200, min_links: int = 10,
+                 probe_samples: int = 3, cache_file: str = None):
+        if mode not in RENDER_MODES:
+            raise ValueError(f"Unknown RENDER_MODE '{mode}', expected one of {RENDER_MODES}")
+        self.mode = mode
+        self.min_text_length = min_text_length
+        self.min_links = min_links
+        self.probe_samples = max(1, probe_samples)
+        self.cache_file = cache_file
+        self.domains: Dict[str, Dict[str, Any]] = {}
+        self._load_cache()
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            mode=settings.get("RENDER_MODE", "playwright"),
+            min_text_length=settings.getint("RENDER_MIN_TEXT_LENGTH", 200),
+            min_links=settings.getint("RENDER_MIN_LINKS", 10),
+            probe_samples=settings.getint("RENDER_PROBE_SAMPLES", 3),
+            cache_file=settings.get("RENDER_MODE_CACHE_FILE"),
+        )
+
+    def _state(self, domain: str) -> Dict[str, Any]:
+        if domain not in self.domains:
+            self.domains[domain] = {"decision": DECISION_PROBE, "http_ok": 0, "helped": 0, "not_helped": 0}
+        return self.domains[domain]
+
+    def decision(self, domain: str) -> str:
+        return self._state(domain)["decision"]
+
+    def use_browser(self, domain: str) -> bool:
+        """True if requests for this domain should go straight to Playwright."""
+        if self.mode == "playwright":
+            return True
+        if self.mode == "http":
+            return False
+        return self.decision(domain) == DECISION_BROWSER
+
+    def should_escalate_page(self, domain: str, html: str, text_length: int) -> bool:
+        """Checks an HTTP-fetched content page and returns True if it needs a browser render."""
+        if self.mode != "hybrid":
+            return False
+        state = self._state(domain)
+        if looks_like_js_shell(html):
+            return True
+        if state["decision"] == DECISION_HTTP:
+            return False
+        if text_length < self.min_text_length:
+            return True
+
+        state["http_ok"] += 1
+        if state["http_ok"] >= self.probe_samples and state["helped"] == 0:
+            state["decision"] = DECISION_HTTP
+        return False
+
+    def should_escalate_listing(self, domain: str, html: str, link_count: int) -> bool:
+        """Checks an HTTP-fetched homepage/listing and returns True if it needs a browser render."""
+        if self.mode != "hybrid":
+            return False
+        if looks_like_js_shell(html):
+            return True
+        return self._state(domain)["decision"] != DECISION_HTTP and link_count < self.min_links
+
+    def record_render(self, domain: str, http_size: int, rendered_size: int):
+        # Compares an escalated page with its HTTP probe to learn if rendering pays off
+        state = self._state(domain)
+        if state["decision"] != DECISION_PROBE:
+            return
+        helped = rendered_size >= max(2 * http_size, http_size + self.min_text_length)
+        state["helped" if helped else "not_helped"] += 1
+
+        if state["helped"] >= self.probe_samples // 2 + 1:
+            state["decision"] = DECISION_BROWSER
+        elif state["not_helped"] >= self.probe_samples:
+            state["decision"] = DECISION_HTTP
+
+    def _load_cache(self):
+        if self.mode != "hybrid" or not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            for domain, decision in cached.items():
+                if decision in (DECISION_HTTP, DECISION_BROWSER):
+                    self._state(domain)["decision"] = decision
+        except Exception as e:
+            sys.stderr.write(f"Warning: could not read render cache {self.cache_file}: {e}\n")
+
+    def save_cache(self):
+        """Merges settled decisions into the cache file (other crawls may own other domains)."""
+        if self.mode != "hybrid" or not self.cache_file:
+            return
+        try:
+            cached = {}
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+            cached.update({d: s["decision"] for d, s in self.domains.items() if s["decision"] != DECISION_PROBE})
+
+            os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+            tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(cached, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            sys.stderr.write(f"Warning: could not write render cache {self.cache_file}: {e}\n")
@@ -0,0 +1,175 @@
+import json
+import os
+import sys
+import weakref
+from collections import defaultdict
+from typing import Dict, Any, Optional
+from urllib.parse import urlparse
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RULES_FILE = os.path.join(BASE_DIR, "config", "resource_rules.json")
+
+# Fallback transfer sizes (bytes) per resource type, used until real responses have been observed
+DEFAULT_SIZE_ESTIMATES = {
+    "image": 45000,
+    "media": 350000,
+    "font": 35000,
+    "stylesheet": 25000,
+    "script": 40000,
+    "xhr": 5000,
+    "fetch": 5000,
+    "other": 5000,
+}
+
+# The blocker bound to the running crawler (PLAYWRIGHT_ABORT_REQUEST needs a module-level entry point)
+ACTIVE_BLOCKER = None
+
+
+def normalize_host(host: str) -> str:
+    host = (host or "").lower().split(':')[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+def host_matches(host: str, patterns) -> bool:
+    # True if host equals or is a subdomain of any pattern
+    return any(host == p or host.endswith("." + p) for p in patterns)
+
+
+def load_resource_rules(rules_file):
+    # Loads per-domain blocking rules, merging each domain with the '*' defaults
+    try:
+        if not os.path.exists(rules_file):
+            return {}
+        with open(rules_file, 'r', encoding='utf-8') as f:
+            rules_list = json.load(f)
+    except Exception as e:
+        sys.stderr.write(f"Warning: Error loading resource rules from {rules_file}: {e}\n")
+        return {}
+
+    defaults = next((r for r in rules_list if r.get('domain') == '*'), {})
+    rules = {}
+    for rule in rules_list:
+        domain = rule.get('domain')
+        if not domain:
+            continue
+        merged = {
+            'block_resource_types': set(rule.get('block_resource_types', defaults.get('block_resource_types', []))),
+            'deny_hosts': set(defaults.get('deny_hosts', [])) | set(rule.get('deny_hosts', [])),
+            'allow_hosts': set(defaults.get('allow_hosts', [])) | set(rule.get('allow_hosts', [])),
+            'block_third_party_scripts': rule.get('block_third_party_scripts',
+                                                  defaults.get('block_third_party_scripts', False)),
+        }
+        merged['allow_resource_types'] = set(rule.get('allow_resource_types', []))
+        merged['block_resource_types'] -= merged['allow_resource_types']
+        rules[normalize_host(domain) if domain != '*' else '*'] = merged
+    return rules
+
+
+class ResourceBlocker:
+    """
+    Scrapy extension that aborts Playwright sub-requests the spider never needs
+    (images, fonts, media, ads and analytics beacons) according to per-domain
+    allow/deny rules. Counts blocked requests and estimates the bytes saved.
+    """
+
+    def __init__(self, rules: Dict[str, Dict[str, Any]], stats=None):
+        self.rules = rules
+        self.stats = stats
+        self.blocked = defaultdict(int)            # resource type -> blocked requests
+        self.blocked_per_domain = defaultdict(int)  # site domain -> blocked requests
+        self.observed_bytes = defaultdict(int)      # resource type -> bytes of allowed responses
+        self.observed_count = defaultdict(int)
+        self._tracked_pages = weakref.WeakSet()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        global ACTIVE_BLOCKER
+        if not crawler.settings.getbool("RESOURCE_BLOCKING_ENABLED"):
+            raise NotConfigured
+        rules = load_resource_rules(crawler.settings.get("RESOURCE_BLOCKING_RULES_FILE") or RULES_FILE)
+        blocker = cls(rules, crawler.stats)
+        crawler.signals.connect(blocker.spider_closed, signal=signals.spider_closed)
+        ACTIVE_BLOCKER = blocker
+        return blocker
+
+    def rule_for(self, site: str) -> Optional[Dict[str, Any]]:
+        for domain, rule in self.rules.items():
+            if domain != '*' and host_matches(site, [domain]):
+                return rule
+        return self.rules.get('*')
+
+    def should_abort(self, playwright_request) -> bool:
+        resource_type = playwright_request.resource_type
+        if resource_type == "document":
+            return False
+
+        page_url = self._page_url(playwright_request)
+        site = normalize_host(urlparse(page_url).netloc) if page_url else ""
+        rule = self.rule_for(site)
+        if rule is None:
+            return False
+
+        host = normalize_host(urlparse(playwright_request.url).netloc)
+        if host_matches(host, rule['allow_hosts']):
+            return False
+
+        block = (resource_type in rule['block_resource_types']
+                 or host_matches(host, rule['deny_hosts'])
+                 or (rule['block_third_party_scripts'] and resource_type == "script"
+                     and site and not host_matches(host, [site])))
+        if block:
+            self.blocked[resource_type] += 1
+            self.blocked_per_domain[site] += 1
+            if self.stats:
+                self.stats.inc_value("resource_blocking/blocked_requests")
+                self.stats.inc_value(f"resource_blocking/blocked_requests/{resource_type}")
+        return block
+
+    def _page_url(self, playwright_request) -> Optional[str]:
+        # The document URL of the page issuing the request; also hooks response size tracking
+        try:
+            frame = playwright_request.frame
+            page = frame.page
+            if page not in self._tracked_pages:
+                self._tracked_pages.add(page)
+                page.on("response", self._record_response)
+            return page.url if page.url.startswith("http") else frame.url
+        except Exception:
+            return playwright_request.headers.get("referer")
+
+    def _record_response(self, response):
+        try:
+            length = int(response.headers.get("content-length", 0))
+        except (TypeError, ValueError):
+            return
+        if length > 0:
+            resource_type = response.request.resource_type
+            self.observed_bytes[resource_type] += length
+            self.observed_count[resource_type] += 1
+
+    def estimated_bytes_saved(self) -> int:
+        total = 0
+        for resource_type, count in self.blocked.items():
+            if self.observed_count[resource_type]:
+                average = self.observed_bytes[resource_type] / self.observed_count[resource_type]
+            else:
+                average = DEFAULT_SIZE_ESTIMATES.get(resource_type, DEFAULT_SIZE_ESTIMATES["other"])
+            total += int(count * average)
+        return total
+
+    def spider_closed(self, spider):
+        saved = self.estimated_bytes_saved()
+        total_blocked = sum(self.blocked.values())
+        if self.stats:
+            self.stats.set_value("resource_blocking/estimated_bytes_saved", saved)
+        spider.logger.info(
+            f"Resource blocking: {total_blocked} requests aborted (~{saved / 1048576:.1f} MB saved). "
+            f"By type: {dict(self.blocked)}. By site: {dict(self.blocked_per_domain)}")
+
+
+def should_abort_request(playwright_request) -> bool:
+    # Entry point referenced by the PLAYWRIGHT_ABORT_REQUEST setting
+    return ACTIVE_BLOCKER is not None and ACTIVE_BLOCKER.should_abort(playwright_request)
@@ -441,19 +441,10 @@
 
 import pandas as pd
 import json
-import re
 import os
 import sys
-import joblib
-from urllib.parse import urlparse
-
-import pandas as pd
-import json
-import re
-import os
-import sys
-import joblib
 from urllib.parse import urlparse
+from collections import Counter
 
 # Paths configuration
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -465,6 +456,11 @@ if crawler_dir not in sys.path:
 
 try:
     import database_manager as db
+    import crawl_stats
+    import record_io
+    # Model loading and feature extraction shared with the in-crawl ClassificationPipeline
+    from classifier import LinkClassifier
+    from features import REQUIRED_FEATURES, XPATH_FEATURES, build_features
 except ImportError:
     print("Could not import database_manager")
     sys.exit(1)
@@ -472,90 +468,147 @@ except ImportError:
 models_path = os.path.join(crawler_dir, "models")
 output_path = os.path.join(root_dir, "predictions")
 
-REQUIRED_FEATURES = [
-    "url_length", "url_depth", "title_length", "text_length", "text_density",
-    "has_date_pattern_in_url", "xpath_depth", "xpath_contains_article",
-    "xpath_contains_main_content", "xpath_contains_story", "is_article_in_category"
-]
-
-
-def get_xpath_features(xpath):
-    data = {'xpath_depth': 0, 'xpath_contains_article': 0, 'xpath_contains_main_content': 0, 'xpath_contains_story': 0}
-    if xpath and isinstance(xpath, str):
-        data['xpath_depth'] = xpath.count('/')
-        if re.search(r'article', xpath, re.I): data['xpath_contains_article'] = 1
-        if re.search(r'main|content', xpath, re.I): data['xpath_contains_main_content'] = 1
-        if re.search(r'story', xpath, re.I): data['xpath_contains_story'] = 1
-    return data
+def prepare_features(df):
+    """Model input of a chunk; the computed xpath features (and missing columns) are kept in the predictions file."""
+    X = build_features(df)
+    df[XPATH_FEATURES] = X[XPATH_FEATURES]
+    for col in REQUIRED_FEATURES:
+        if col not in df.columns: df[col] = X[col]
+    return X
 
 
-def run_prediction(file_path):
+def run_prediction(file_path, chunk_size=record_io.DEFAULT_CHUNK_SIZE):
     os.makedirs(output_path, exist_ok=True)
 
+    # Stage timings, label distribution and DB operation counts for the runner (see crawl_stats)
+    timer = crawl_stats.StageTimer()
+    db_ops = Counter()
+    labels = Counter()
+    rows = 0
+    stats_file = crawl_stats.stats_path_for(file_path)
+    # A partial in-crawl pass (see MySQLPipeline): its DB counts are kept and added to
+    in_crawl = crawl_stats.read_stats(stats_file).get("prediction", {})
+    if in_crawl.get("in_crawl"):
+        db_ops.update(in_crawl.get("db", {}))
+
     try:
-        model = joblib.load(os.path.join(models_path, "link_classifier.pkl"))
-        encoder = joblib.load(os.path.join(models_path, "label_encoder.pkl"))
+        with timer.stage("load_model"):
+            classifier = LinkClassifier.load(models_path)
     except Exception as e:
         print(f"Error loading models: {e}")
         return
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            raw_data = json.load(f)
-        df = pd.DataFrame(raw_data)
+        with timer.stage("db"):
+            sites = db.get_active_sites()
+            site_map = {db.normalize_domain(s["domain"]): s["id"] for s in sites}
     except Exception as e:
-        print(f"Error reading file: {e}")
-        return
+        print(f"Database error: {e}")
+        site_map = None
 
-    if df.empty: return
+    # The raw output is processed one chunk at a time, so memory does not grow with the crawl
+    writer = db.ArticleWriter() if site_map is not None else None
+    preds_writer = None
+    chunks = record_io.iter_chunks(file_path, chunk_size)
+    # Whatever stops the loop, earlier chunks' predictions and buffered articles are flushed and
+    # the stats section is written
+    try:
+        while True:
+            try:
+                with timer.stage("read"):
+                    chunk = next(chunks, None)
+            except Exception as e:
+                print(f"Error reading file: {e}")
+                break
+            if not chunk:
+                break
+            df = pd.DataFrame(chunk)
 
-    xpath_col = 'xpath' if 'xpath' in df.columns else 'source_xpath'
-    xpath_data = df[xpath_col].apply(lambda x: get_xpath_features(x if isinstance(x, str) else ""))
-    df_features = pd.DataFrame(xpath_data.tolist())
-    df = pd.concat([df.reset_index(drop=True), df_features.reset_index(drop=True)], axis=1)
+            with timer.stage("features"):
+                X = prepare_features(df)
 
-    for col in REQUIRED_FEATURES:
-        if col not in df.columns: df[col] = 0
+            # Records labelled by the in-crawl ClassificationPipeline were already stored by MySQLPipeline
+            if 'predicted_label' in df.columns:
+                pending = df['predicted_label'].isna()
+            else:
+                pending = pd.Series(True, index=df.index)
+            try:
+                with timer.stage("predict"):
+                    if pending.any():
+                        df.loc[pending, 'predicted_label'] = classifier.predict_features(X[pending])
+            except Exception as e:
+                print(f"Prediction failed: {e}")
+                break
+            rows += len(df)
+            labels.update(str(label) for label in df['predicted_label'])
 
-    try:
-        X = df[REQUIRED_FEATURES].astype(float).fillna(0)
-        df['predicted_label'] = encoder.inverse_transform(model.predict(X))
-    except Exception as e:
-        print(f"Prediction failed: {e}")
-        return
+            # --- ΔΙΟΡΘΩΣΗ 1: ΑΠΟΘΗΚΕΥΣΗ JSON ΜΕ ΚΑΝΟΝΙΚΑ ΕΛΛΗΝΙΚΑ ---
+            with timer.stage("write_predictions"):
+                if preds_writer is None:
+                    domain_name = urlparse(df.iloc[0]["url"]).netloc.replace('.', '_')
+                    suffix = record_io.split_suffix(file_path)[1] or ".jsonl"
+                    preds_writer = record_io.RecordWriter(os.path.join(output_path, f"preds_{domain_name}{suffix}"))
+                # to_json keeps the frame's own serialisation of numpy values
+                for record in json.loads(df.to_json(orient="records", force_ascii=False)):
+                    preds_writer.write(record)
 
-    # --- ΔΙΟΡΘΩΣΗ 1: ΑΠΟΘΗΚΕΥΣΗ JSON ΜΕ ΚΑΝΟΝΙΚΑ ΕΛΛΗΝΙΚΑ ---
-    first_url = df.iloc[0]["url"]
-    domain_name = urlparse(first_url).netloc.replace('.', '_')
-    output_file = os.path.join(output_path, f"preds_{domain_name}.json")
+            if writer is None:
+                continue
+            try:
+                with timer.stage("db"):
+                    for _, row in df[pending].iterrows():
+                        if str(row.get('predicted_label', '')).lower() == "article":
+                            url = row["url"]
+                            domain = db.normalize_domain(urlparse(url).netloc)
+                            sid = site_map.get(domain)
 
-    # Χρήση force_ascii=False για να μην βλέπουμε \u03b2
-    df.to_json(output_file, orient="records", indent=2, force_ascii=False)
+                            if sid:
+                                imgs = row.get("image_urls", [])
+                                img = imgs[0] if isinstance(imgs, list) and len(imgs) > 0 else None
 
-    try:
-        sites = db.get_active_sites()
-        site_map = {db.normalize_domain(s["domain"]): s["id"] for s in sites}
+                                # Ο writer στέλνει τα δεδομένα στη MySQL σε batches
+                                writer.add(
+                                    site_id=sid,
+                                    url=url,
+                                    title=row.get("title", "No Title"),
+                                    body=row.get("article_body", ""),
+                                    image_url=img
+                                )
+                            else:
+                                db_ops["skipped_unknown_site"] += 1
+            except Exception as e:
+                print(f"Database error: {e}")
+    finally:
+        if preds_writer is not None:
+            preds_writer.close()
+        if rows:
+            write_prediction_stats(writer, rows, labels, db_ops, timer, stats_file)
 
-        for _, row in df.iterrows():
-            if str(row.get('predicted_label', '')).lower() == "article":
-                url = row["url"]
-                domain = db.normalize_domain(urlparse(url).netloc)
-                sid = site_map.get(domain)
 
-                if sid:
-                    imgs = row.get("image_urls", [])
-                    img = imgs[0] if isinstance(imgs, list) and len(imgs) > 0 else None
+def write_prediction_stats(writer, rows, labels, db_ops, timer, stats_file):
+    if writer is not None:
+        try:
+            with timer.stage("db"):
+                writer.close()
+            db_ops.update(writer.counts[None])
+        except Exception as e:
+            print(f"Database error: {e}")
 
-                    # Η save_article θα στείλει τα δεδομένα στη MySQL
-                    db.save_article(
-                        site_id=sid,
-                        url=url,
-                        title=row.get("title", "No Title"),
-                        body=row.get("article_body", ""),
-                        image_url=img
-                    )
-    except Exception as e:
-        print(f"Database error: {e}")
+    prediction_section = {
+        "rows": rows,
+        "labels": dict(labels),
+        "db": {
+            "new": db_ops[db.STATUS_NEW],
+            "updated": db_ops[db.STATUS_UPDATED],
+            "unchanged": db_ops[db.STATUS_UNCHANGED],
+            "errors": db_ops["errors"],
+            "skipped_unknown_site": db_ops["skipped_unknown_site"],
+        },
+        "timings": timer.as_dict(),
+        "db_pool": db.pool_stats(),
+    }
+    crawl_stats.write_stats_section(stats_file, "prediction", prediction_section)
+    print(f"Prediction summary: {json.dumps(prediction_section, ensure_ascii=False)}")
 
 
 if __name__ == "__main__":
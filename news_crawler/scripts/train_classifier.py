@@ -1,11 +1,13 @@
+import argparse
+import math
 import pandas as pd
-import json
 import re
 import os
 import sys
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import StratifiedKFold, cross_val_predict, train_test_split
+from sklearn.metrics import f1_score
 from sklearn.metrics import classification_report, confusion_matrix
 import joblib
 from numpy import unique
@@ -17,39 +19,63 @@ if "scripts" in PROJECT_ROOT:
     PROJECT_ROOT = os.path.dirname(PROJECT_ROOT)
 
 DATA_DIR = os.path.join(PROJECT_ROOT, "data")
+STORE_DIR = os.path.join(DATA_DIR, "store")
 MODELS_DIR = os.path.join(PROJECT_ROOT, "models")
+CATEGORIES_FILE = os.path.join(PROJECT_ROOT, "general_category_keywords", "categories.yml")
+CACHE_DIR = os.path.join(PROJECT_ROOT, "cache")
 
-# Dynamic data loading
-# Collect all json files from the data directory containing labeled training samples
-data_files: List[str] = [
-    os.path.join(DATA_DIR, f)
-    for f in os.listdir(DATA_DIR)
-    if f.endswith('.json') and os.path.isfile(os.path.join(DATA_DIR, f))
+# --search candidates: smaller and shallower forests than the default, which the search may prefer
+# when they score within --tolerance of the best one
+DEFAULT_PARAMS = {"n_estimators": 100, "max_depth": None, "min_samples_leaf": 1}
+SEARCH_GRID = [
+    {"n_estimators": n, "max_depth": depth, "min_samples_leaf": leaf}
+    for n in (25, 50, 100, 200)
+    for depth in (8, 12, 16, None)
+    for leaf in (1, 3)
 ]
 
-all_data = []
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
 
-# Validate data availability
-if not data_files:
-    sys.stderr.write(f"Error: No JSON files found in {DATA_DIR}. Training aborted.\n")
-    sys.exit(1)
+parser = argparse.ArgumentParser(description="Train the page classifier (default) or the pre-fetch URL model.")
+parser.add_argument("--url-model", action="store_true",
+                    help="train models/url_classifier.pkl, which scores links from their URL before fetching")
+parser.add_argument("--recall", type=float, default=0.98,
+                    help="--url-model: share of training articles (scored out-of-fold) the threshold must keep")
+parser.add_argument("--jobs", type=int, default=-1, help="parallel fits (joblib n_jobs; -1 = all cores)")
+parser.add_argument("--search", action="store_true",
+                    help="cross-validated search over SEARCH_GRID, weighing accuracy against size and latency")
+parser.add_argument("--folds", type=int, default=5, help="--search: cross-validation folds")
+parser.add_argument("--tolerance", type=float, default=0.005,
+                    help="--search: macro F1 a candidate may lose to the best one and still be picked for speed")
+parser.add_argument("--json", metavar="DIR",
+                    help="train from a directory of JSON exports (cached in cache/) instead of data/store")
+parser.add_argument("--rebuild-cache", action="store_true", help="--json: re-parse DIR even if the cache is current")
+args = parser.parse_args()
 
-print(f"loading {len(data_files)} datasets for training")
+# Dynamic data loading
+# The labeled dataset store (data/store, see dataset_store), reading only the columns training uses.
+# With --json, a directory of JSON exports, parsed once and then read from the columnar cache
+# (training_cache) until one of them changes
+if args.json:
+    from training_cache import TrainingCache, data_files
 
-# Aggregate data from all identified sources
-for file_path in data_files:
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            all_data.extend(data)
-    except json.JSONDecodeError as e:
-        print(f"Skipping {os.path.basename(file_path)}: Invalid JSON format.")
-        continue
-    except Exception as e:
-        print(f"Skipping {os.path.basename(file_path)}: {str(e)}")
-        continue
+    # Validate data availability
+    if not data_files(args.json):
+        sys.stderr.write(f"Error: No JSON files found in {args.json}. Training aborted.\n")
+        sys.exit(1)
+    df = TrainingCache(args.json, CACHE_DIR).load(rebuild=args.rebuild_cache)
+else:
+    from dataset_store import DatasetStore
+    from features import INPUT_COLUMNS
 
-df = pd.DataFrame(all_data)
+    if not DatasetStore.exists(STORE_DIR):
+        sys.stderr.write(f"Error: No dataset store in {STORE_DIR} (build one with dataset_store.py import). "
+                         f"Training aborted.\n")
+        sys.exit(1)
+    store = DatasetStore(STORE_DIR)
+    print(f"loading {store.rows} rows ({len(store.meta['batches'])} batches) from {STORE_DIR}")
+    df = store.load(["url", "label"] + INPUT_COLUMNS)
 
 # Data cleaning keep only samples with a target label
 if "label" not in df.columns:
@@ -62,45 +88,135 @@ if df.empty:
     sys.stderr.write("Error: Dataset is empty after label filtering.\n")
     sys.exit(1)
 
-# Preprocessing: Handle missing values for numerical and categorical features
-# This ensures consistency during the mathematical training process
-df.fillna({
-    "title_length": 0,
-    "text_length": 0,
-    "text_density": 0,
-    "url_length": 0,
-    "url_depth": 0,
-    "has_date_pattern_in_url": False,
-    "xpath_depth": 0,
-    "xpath_contains_article": False,
-    "xpath_contains_main_content": False,
-    "xpath_contains_story": False,
-    "is_article_in_category": False
-}, inplace=True)
+
+def train_url_model(df: pd.DataFrame, target_recall: float):
+    """
+    Article vs. everything else from URL features only. The decision threshold is the highest
+    score that still keeps target_recall of the training articles, scored out-of-fold so the
+    threshold sees no page its model was fitted on. Recall and skip rate are then measured on
+    the test split, which plays no part in choosing the threshold.
+    """
+    import numpy as np
+    import yaml
+    from classifier import URL_FEATURES, URL_MODEL_FILE, URL_POSITIVE_LABEL, url_features
+    from keyword_matcher import KeywordMatcher
+
+    with open(CATEGORIES_FILE, "r", encoding="utf-8") as f:
+        category_matcher = KeywordMatcher.from_categories(yaml.safe_load(f))
+
+    df = df[df["url"].notnull()]
+    X = np.array([url_features(str(u), category_matcher) for u in df["url"]], dtype=float)
+    y = (df["label"] == URL_POSITIVE_LABEL).astype(int).to_numpy()
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42, stratify=y)
+    # Small forest: it scores every link of every listing page during the crawl
+    url_clf = RandomForestClassifier(n_estimators=50, max_depth=12, min_samples_leaf=2, random_state=42)
+    folds = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
+    oof_scores = cross_val_predict(url_clf, X_train, y_train, cv=folds, method="predict_proba")[:, 1]
+    article_scores = np.sort(oof_scores[y_train == 1])[::-1]
+    keep = max(1, math.ceil(target_recall * len(article_scores)))
+    threshold = float(article_scores[keep - 1])
+
+    url_clf.fit(X_train, y_train)
+    scores = url_clf.predict_proba(X_test)[:, list(url_clf.classes_).index(1)]
+    kept = scores >= threshold
+    recall = kept[y_test == 1].mean()
+    skipped_noise = (~kept[y_test == 0]).mean() if (y_test == 0).any() else 0.0
+    print(f"\n URL Model ({len(URL_FEATURES)} features, {len(X)} samples)")
+    print(classification_report(y_test, (scores >= 0.5).astype(int), target_names=["not article", "article"]))
+    print(f"Threshold {threshold:.3f} (out-of-fold, training split), on the test split: article recall {recall:.3f}, non-article links skipped {skipped_noise:.3f}, "
+          f"all links skipped {(~kept).mean():.3f}")
+
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    joblib.dump({"model": url_clf, "features": URL_FEATURES, "threshold": threshold, "recall": float(recall)},
+                os.path.join(MODELS_DIR, URL_MODEL_FILE))
+    print(f"\nURL model exported to: {os.path.join(MODELS_DIR, URL_MODEL_FILE)}")
+
+
+def _cv_fold(params: Dict[str, Any], X, y, train_idx, val_idx):
+    clf = RandomForestClassifier(random_state=42, **params)
+    clf.fit(X[train_idx], y[train_idx])
+    y_pred = clf.predict(X[val_idx])
+    return f1_score(y[val_idx], y_pred, average="macro"), (y_pred == y[val_idx]).mean()
+
+
+def _fit(params: Dict[str, Any], X, y):
+    return RandomForestClassifier(random_state=42, **params).fit(X, y)
+
+
+def search_hyperparameters(X, y, classes, jobs: int, folds: int, tolerance: float) -> Dict[str, Any]:
+    """
+    Cross-validates every SEARCH_GRID candidate in parallel (one joblib task per candidate and fold),
+    then measures each candidate's compact export: size on disk and latency per 1k pages with the
+    CompactForest engine LinkClassifier serves from. The pick is the lowest-latency candidate whose
+    macro F1 is within tolerance of the best.
+    """
+    import tempfile
+    import time
+    import numpy as np
+    from joblib import Parallel, delayed
+    from compact_forest import CompactForest, export_forest
+
+    X = X.to_numpy()
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=42).split(X, y))
+    print(f"\n Hyperparameter search: {len(SEARCH_GRID)} candidates x {folds} folds, n_jobs={jobs}")
+    scores = Parallel(n_jobs=jobs)(
+        delayed(_cv_fold)(params, X, y, train_idx, val_idx)
+        for params in SEARCH_GRID for train_idx, val_idx in splits
+    )
+    models = Parallel(n_jobs=jobs)(delayed(_fit)(params, X, y) for params in SEARCH_GRID)
+
+    # latency is timed one candidate at a time, after the parallel fits
+    batch = X[np.arange(1000) % len(X)]
+    results = []
+    for i, (params, model) in enumerate(zip(SEARCH_GRID, models)):
+        f1 = np.array([score[0] for score in scores[i * folds:(i + 1) * folds]])
+        accuracy = np.mean([score[1] for score in scores[i * folds:(i + 1) * folds]])
+        with tempfile.TemporaryDirectory() as directory:
+            export_forest(model, classes[model.classes_], REQUIRED_FEATURES, directory)
+            size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+            forest = CompactForest.load(directory, mmap=False)
+            latency = float("inf")
+            for _ in range(5):
+                started = time.perf_counter()
+                forest.predict(batch)
+                latency = min(latency, time.perf_counter() - started)
+        results.append({
+            **params, "f1": f1.mean(), "f1_std": f1.std(), "accuracy": accuracy,
+            "nodes": sum(e.tree_.node_count for e in model.estimators_), "kb": size / 1024,
+            "ms_per_1k": latency * 1000,
+        })
+
+    best_f1 = max(r["f1"] for r in results)
+    chosen = min((r for r in results if r["f1"] >= best_f1 - tolerance), key=lambda r: (r["ms_per_1k"], r["nodes"]))
+
+    print(f"{'trees':>5} {'depth':>5} {'leaf':>4}  {'macro F1':>15} {'accuracy':>8} {'nodes':>7} {'KB':>7} {'ms/1k':>7}")
+    for r in sorted(results, key=lambda r: -r["f1"]):
+        mark = "  <- chosen" if r is chosen else ""
+        print(f"{r['n_estimators']:>5} {str(r['max_depth']):>5} {r['min_samples_leaf']:>4}  "
+              f"{r['f1']:.4f} +/- {r['f1_std']:.4f} {r['accuracy']:>8.4f} {r['nodes']:>7} {r['kb']:>7.0f} "
+              f"{r['ms_per_1k']:>7.1f}{mark}")
+    print(f"Best macro F1 {best_f1:.4f}; chosen: fastest within {tolerance} of it")
+    return {name: chosen[name] for name in DEFAULT_PARAMS}
+
+
+if args.url_model:
+    train_url_model(df, args.recall)
+    sys.exit(0)
 
 # Feature selection for the Random Forest model
-# Must match the features extracted during the crawling phase
-features: List[str] = [
-    "url_length",
-    "url_depth",
-    "title_length",
-    "text_length",
-    "text_density",
-    "has_date_pattern_in_url",
-    "xpath_depth",
-    "xpath_contains_article",
-    "xpath_contains_main_content",
-    "xpath_contains_story",
-    "is_article_in_category"
-]
+# Computed by features.build_features, exactly as the predictor and the crawl pipeline do:
+# the xpath features come from the page's xpath, missing and "None" values become 0
+from features import REQUIRED_FEATURES, XPATH_FEATURES, build_features
+features: List[str] = list(REQUIRED_FEATURES)
 
 # Robustness check: Verify all required feature columns exist
 for feature in features:
-    if feature not in df.columns:
+    if feature not in XPATH_FEATURES and feature not in df.columns:
         sys.stderr.write(f"Error: Required feature '{feature}' missing from data.\n")
         sys.exit(1)
 
-X = df[features]
+X = build_features(df)
 y = df["label"]
 
 # Categorical label encoding
@@ -111,9 +227,14 @@ y_encoded = label_encoder.fit_transform(y)
 X_train, X_test, y_train, y_test = train_test_split(X, y_encoded, test_size=0.25, random_state=42)
 
 # Model Training: Random Forest Classifier
-# Parameters chosen to balance complexity and generalization
-clf = RandomForestClassifier(n_estimators=100, random_state=42)
+# DEFAULT_PARAMS, or the candidate --search picks on the training split (the test split stays unseen)
+params = DEFAULT_PARAMS
+if args.search:
+    params = search_hyperparameters(X_train, y_train, label_encoder.classes_, args.jobs, args.folds, args.tolerance)
+print(f"\nTraining with {params}")
+clf = RandomForestClassifier(random_state=42, n_jobs=args.jobs, **params)
 clf.fit(X_train, y_train)
+clf.n_jobs = None   # the pickle predicts single-threaded, like the compact export
 
 # Evaluation Phase
 y_pred = clf.predict(X_test)
@@ -135,4 +256,8 @@ joblib.dump(clf, os.path.join(MODELS_DIR, "link_classifier.pkl"))
 joblib.dump(label_encoder, os.path.join(MODELS_DIR, "label_encoder.pkl"))
 joblib.dump(features, os.path.join(MODELS_DIR, "feature_names.pkl"))
 
+# Compact copy loaded by LinkClassifier: flat arrays, memory-mapped without sklearn
+from compact_forest import COMPACT_DIR, export_forest
+export_forest(clf, label_encoder.inverse_transform(clf.classes_), features, os.path.join(MODELS_DIR, COMPACT_DIR))
+
 print(f"\nModel and features successfully exported to: {MODELS_DIR}")
\ No newline at end of file
@@ -14,7 +14,8 @@ ROBOTSTXT_OBEY = False
 
 #PLAYWRIGHT INTEGRATION
 
-# Enable Playwright handlers for full JavaScript rendering (Client-side rendering)
+# Enable Playwright handlers for full JavaScript rendering (Client-side rendering).
+# Requests without meta["playwright"] fall through to Scrapy's regular HTTP handler.
 DOWNLOAD_HANDLERS = {
     "http": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
     "https": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
@@ -27,11 +28,76 @@ TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 PLAYWRIGHT_BROWSER_TYPE = "chromium"
 PLAYWRIGHT_LAUNCH_OPTIONS = {
     "headless": True,
+    # Lean page profile: the spider only reads DOM text and meta tags
+    "args": ["--disable-extensions", "--mute-audio", "--disable-background-networking"],
+}
+
+# Service workers would bypass request interception, so they are blocked in every context
+PLAYWRIGHT_CONTEXTS = {
+    "default": {"service_workers": "block"},
 }
 
 # Set navigation timeout to 90s to handle slow servers or heavy assets
 PLAYWRIGHT_DEFAULT_NAVIGATION_TIMEOUT = 90000
 
+# --- PLAYWRIGHT RESOURCE BLOCKING ---
+
+# Abort images, fonts, media, stylesheets and ad/analytics hosts inside rendered pages.
+# Per-domain allow/deny lists live in config/resource_rules.json ('*' holds the defaults).
+RESOURCE_BLOCKING_ENABLED = True
+RESOURCE_BLOCKING_RULES_FILE = None  # None = news_crawler/config/resource_rules.json
+PLAYWRIGHT_ABORT_REQUEST = "news_crawler.resource_blocking.should_abort_request"
+
+EXTENSIONS = {
+    "news_crawler.resource_blocking.ResourceBlocker": 500,
+}
+
+# --- BROWSER CONTEXT/PAGE POOL ---
+
+# Reuse warm Playwright pages across requests instead of opening one page per request
+BROWSER_POOL_ENABLED = True
+# Idle pages kept open for the next requests
+BROWSER_POOL_MAX_IDLE_PAGES = 4
+# Recycle the pooled context after it has served this many pages
+BROWSER_POOL_CONTEXT_MAX_PAGES = 200
+# ...or as soon as the Playwright/Chromium processes exceed this resident memory
+BROWSER_POOL_RSS_LIMIT_MB = 1500
+# Memory is sampled every N pages
+BROWSER_POOL_RSS_CHECK_INTERVAL = 20
+
+DOWNLOADER_MIDDLEWARES = {
+    # Per-domain page/time budget; ahead of the cache and retries so dropped requests cost nothing
+    "news_crawler.middlewares.CrawlBudgetMiddleware": 540,
+    # Conditional-GET cache; after HttpCompressionMiddleware (590) in the response chain so bodies are
+    # stored decoded, and off MetaRefreshMiddleware's slot (580)
+    "news_crawler.middlewares.News_crawlerDownloaderMiddleware": 585,
+    # Closer to the downloader than RetryMiddleware (550): pages are released before a retry.
+    # 610 keeps it clear of the built-in slots (RedirectMiddleware is 600)
+    "news_crawler.middlewares.BrowserPoolMiddleware": 610,
+}
+
+# --- CONDITIONAL-GET CACHE ---
+# Plain HTTP responses with ETag/Last-Modified are kept under CONDITIONAL_CACHE_DIR and revalidated
+# on recrawl; a 304 is answered from disk. With CONDITIONAL_CACHE_SKIP_UNCHANGED, parse_page does not
+# re-extract pages the server reported unchanged.
+CONDITIONAL_CACHE_ENABLED = True
+CONDITIONAL_CACHE_DIR = "cache/http"
+CONDITIONAL_CACHE_SKIP_UNCHANGED = False
+
+# --- RENDER ESCALATION (HYBRID FETCH MODE) ---
+
+# "playwright": render every page, "http": never render,
+# "hybrid": fetch over plain HTTP and re-queue through Playwright only JavaScript-only pages
+RENDER_MODE = "hybrid"
+# HTTP pages with less extracted text than this are probed with a browser render
+RENDER_MIN_TEXT_LENGTH = 200
+# HTTP homepages with fewer links than this are probed with a browser render
+RENDER_MIN_LINKS = 10
+# Number of probes needed before a domain is settled on HTTP or on Playwright
+RENDER_PROBE_SAMPLES = 3
+# Settled per-domain decisions are reused by later crawls
+RENDER_MODE_CACHE_FILE = "cache/render_modes.json"
+
 # --- ERROR HANDLING & RETRY LOGIC ---
 
 RETRY_ENABLED = True
@@ -49,12 +115,84 @@ CONCURRENT_REQUESTS = 8
 CONCURRENT_REQUESTS_PER_DOMAIN = 2
 CONCURRENT_REQUESTS_PER_IP = 0
 
-# Pipeline order: Primary database insertion followed by JSON backup
+# --- RAW OUTPUT ---
+# Format of results/raw_<domain>.* written by CustomJsonPipeline: "jsonl" (one compact record per
+# line), "jsonl.gz", "jsonl.zst" (needs the zstandard package) or "json" (legacy pretty-printed array).
+# Line formats are flushed every OUTPUT_FLUSH_ITEMS records or OUTPUT_FLUSH_SECONDS, so a crashed
+# crawl keeps its records, and are read back in chunks by the prediction step.
+OUTPUT_FORMAT = "jsonl"
+OUTPUT_FLUSH_ITEMS = 50
+OUTPUT_FLUSH_SECONDS = 10.0
+
+# --- EXTRACTION POOL ---
+# trafilatura extraction runs in EXTRACTION_WORKERS spawned processes (0 = inline in the reactor
+# thread). Once EXTRACTION_MAX_PENDING pages are queued or running, parse_page waits for a slot.
+EXTRACTION_WORKERS = 2
+EXTRACTION_MAX_PENDING = 8
+# Seconds of regex matching allowed per body by the boilerplate rules (see boilerplate.py). The combined
+# pass gets half; if it runs out, the rules are retried one by one in the other half, each with an
+# equal share of the time left, and a rule that times out is skipped
+BOILERPLATE_RULE_TIMEOUT = 0.05
+
+# --- DISCOVERY ---
+# "auto": articles come from robots.txt sitemaps or feeds (DISCOVERY_FALLBACK_PATHS when robots lists
+# none), keeping only entries newer than the site's last visit; sites without any fall back to
+# homepage link extraction. "homepage": homepage link extraction only.
+DISCOVERY_MODE = "auto"
+DISCOVERY_FALLBACK_PATHS = ["/sitemap.xml", "/rss", "/feed"]
+DISCOVERY_MAX_SITEMAPS = 10  # sitemap/feed documents fetched per site, newest first
+DISCOVERY_MAX_URLS = 300  # article URLs scheduled per site from sitemaps and feeds
+DISCOVERY_LASTMOD_SLACK = 3600  # seconds of clock skew tolerated when comparing lastmod
+
+# --- URL FRONTIER ---
+# Fetch history kept across runs as sorted 64-bit URL fingerprints, one memory-mapped file per domain.
+# URLs fetched less than FRONTIER_RECHECK_TTL seconds ago are skipped ("skip") or scheduled after
+# everything else ("deprioritize"). Entries older than FRONTIER_RETENTION_DAYS are dropped on save.
+FRONTIER_ENABLED = True
+FRONTIER_DIR = "cache/frontier"
+FRONTIER_RECHECK_TTL = 6 * 3600
+FRONTIER_MODE = "skip"
+FRONTIER_DEPRIORITIZED_PRIORITY = -10
+FRONTIER_RETENTION_DAYS = 30
+
+# --- CRAWL DEPTH & BUDGET ---
+# Listing hops followed from the homepage: 1 = homepage links only, 2 = also the links of the
+# category pages found there, and so on. Links are fetched best-first (article score, date in the URL).
+CRAWL_MAX_DEPTH = 2
+# Per-domain caps on fetched pages and on crawl time in seconds (0 = unlimited); page requests
+# still queued when a domain's budget is spent are dropped
+CRAWL_DOMAIN_MAX_PAGES = 300
+CRAWL_DOMAIN_MAX_SECONDS = 900
+
+# --- URL PREFILTER ---
+# models/url_classifier.pkl (scripts/train_classifier.py --url-model) scores every listing link from its
+# URL before it is requested. Links below the threshold are skipped ("skip") or fetched last
+# ("deprioritize"). URL_PREFILTER_THRESHOLD = None uses the threshold picked at training time for
+# the --recall target; lower it to lose fewer articles. Without a trained model nothing is filtered.
+URL_PREFILTER_ENABLED = True
+URL_PREFILTER_MODE = "skip"
+URL_PREFILTER_THRESHOLD = None
+URL_PREFILTER_DEPRIORITIZED_PRIORITY = -5
+
+# Pipeline order: In-crawl classification, primary database insertion, then JSON backup
 ITEM_PIPELINES = {
+    'news_crawler.pipelines.ClassificationPipeline': 200,
     'news_crawler.pipelines.MySQLPipeline': 300,
     'news_crawler.pipelines.CustomJsonPipeline': 400,
 }
 
+# --- IN-CRAWL CLASSIFICATION ---
+# Label pages inside the crawl instead of re-reading the raw output with predict_new_site.py.
+# Items are classified in batches of CLASSIFIER_BATCH_SIZE, or after CLASSIFIER_BATCH_MAX_DELAY seconds.
+CLASSIFY_DURING_CRAWL = True
+CLASSIFIER_BATCH_SIZE = 32
+CLASSIFIER_BATCH_MAX_DELAY = 1.0
+
+# Articles are written to MySQL in batches of ARTICLE_WRITE_BATCH_SIZE, or once the oldest
+# buffered article has waited ARTICLE_WRITE_MAX_DELAY seconds (a timer, so quiet domains flush too)
+ARTICLE_WRITE_BATCH_SIZE = 100
+ARTICLE_WRITE_MAX_DELAY = 5.0
+
 # AutoThrottle: Dynamically adjust crawling speed based on server response times
 AUTOTHROTTLE_ENABLED = True
 AUTOTHROTTLE_START_DELAY = 3      # Initial delay in seconds
@@ -1,14 +1,13 @@
 import scrapy
 from urllib.parse import urlparse, urljoin
-import json
 import re
 import os
 import sys
+import time
+from datetime import date
 from pkgutil import get_data
 
-import trafilatura
-from scrapy.selector import Selector
-from typing import List, Dict, Any, Pattern
+from typing import List, Dict, Any
 import yaml
 
 SPIDER_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -25,49 +24,98 @@ ROOT_DIR = os.path.dirname(CRAWLER_DIR)               #  Root
 if MANAGER_DIR not in sys.path:
     sys.path.append(MANAGER_DIR)
 
-
-    try:
-        from items import PageItem
-        import database_manager as db
-    except ImportError as e:
-        sys.stderr.write(f"failed to import core moduless: {e}\n")
-        sys.exit(1)
-#clean up
-CONFIG_DIR = os.path.join(MANAGER_DIR, "config")
-RULES_FILE = os.path.join(CONFIG_DIR, "boilerplate_rules.json")
-
-
-def  load_cleanup_rules(rules_file):
-    #loads and compiles Regex rules per domain from a JSON configuration file
-    compiled_rules = {}
-    try:
-        if not os.path.exists(rules_file):
-            return compiled_rules
-        with open(rules_file, 'r', encoding='utf-8') as f:
-            rules_list = json.load(f)
-        for rule in rules_list:
-            domain = rule.get('domain')
-            patterns = rule.get('patterns')
-            if domain and patterns and isinstance(patterns, list):
-                compiled_rules[domain] = [re.compile(p, re.IGNORECASE | re.DOTALL) for p in patterns if
-                                          isinstance(p, str)]
-        return compiled_rules
-    except Exception as e:
-        sys.stderr.write(f"️ Warnings: Error loading rules from {rules_file}: {e}\n")
-        return {}
-
-
-# Pre-load rules once during module initialization
-SITE_REGEX_RULES = load_cleanup_rules(RULES_FILE)
+# Imported unconditionally: in-process runners already have news_crawler on the path
+try:
+    from items import PageItem
+    import database_manager as db
+    from render_policy import RenderPolicy
+    from url_frontier import URLFrontier, url_fingerprint
+    import discovery
+    from extraction import ExtractionPool
+    from keyword_matcher import KeywordMatcher
+    from classifier import URLClassifier
+    from crawl_budget import CrawlBudget
+    import crawl_stats
+    import record_io
+except ImportError as e:
+    sys.stderr.write(f"failed to import core moduless: {e}\n")
+    sys.exit(1)
+
+# Listing candidates: links whose path is a short run of word segments (/politiki, /news/world),
+# i.e. section pages, that match a category keyword or that the URL model rejects as articles
+SECTION_MAX_SEGMENTS = 2
+SECTION_SEGMENT = re.compile(r"^[^\W\d_][\w-]*$")
+
+
+def is_section_url(url) -> bool:
+    segments = [seg for seg in urlparse(url).path.split('/') if seg]
+    return 0 < len(segments) <= SECTION_MAX_SEGMENTS and all(SECTION_SEGMENT.match(seg) for seg in segments)
+
+
+# Targeted article links: anchors inside <main>/<article>, or whose href looks like an article URL.
+# Pages without any fall back to every anchor.
+ARTICLE_LINK_CONTAINERS = ('main', 'article')
+ARTICLE_HREF_PARTS = ('/article', '/story', '/news')
+ANCHOR_TEXT_MAX_CHARS = 200
+
+
+def extract_links(root, sections=False):
+    """
+    (href, element) pairs from one walk over the parsed document (response.selector.root),
+    so anchors keep their place in the tree (xpath) and nothing is parsed twice.
+    With sections, section links outside the targeted areas (menus) are included as well.
+    """
+    targeted, everything, menu = [], [], []
+    for el in root.iter('a'):
+        href = (el.get('href') or '').strip()
+        if not href:
+            continue
+        everything.append((href, el))
+        if any(part in href for part in ARTICLE_HREF_PARTS) or \
+                next(el.iterancestors(*ARTICLE_LINK_CONTAINERS), None) is not None:
+            targeted.append((href, el))
+        elif sections and is_section_url(href):
+            menu.append((href, el))
+    return (targeted + menu) if targeted else everything
+
+
+def anchor_text(el) -> str:
+    return " ".join(el.text_content().split())[:ANCHOR_TEXT_MAX_CHARS]
+
+
+# Best-first link priorities: article score (0..100, unscored links in the middle), adjusted by the
+# age of a /YYYY/MM/DD/ date in the URL and lowered by every listing hop from the homepage
+PRIORITY_SCORE_SCALE = 100
+PRIORITY_FRESH_DAYS = 2
+PRIORITY_FRESH_BONUS = 30
+PRIORITY_STALE_DAYS = 30
+PRIORITY_STALE_PENALTY = 30
+PRIORITY_DEPTH_PENALTY = 10
+URL_DATE = re.compile(r"/(\d{4})/(\d{2})/(\d{2})/")
+
+
+def link_priority(url, score, depth, today=None) -> int:
+    priority = round((0.5 if score is None else score) * PRIORITY_SCORE_SCALE)
+    found = URL_DATE.search(url + '/')
+    if found:
+        try:
+            age = ((today or date.today()) - date(*map(int, found.groups()))).days
+        except ValueError:
+            age = None
+        if age is not None and age <= PRIORITY_FRESH_DAYS:
+            priority += PRIORITY_FRESH_BONUS
+        elif age is not None and age > PRIORITY_STALE_DAYS:
+            priority -= PRIORITY_STALE_PENALTY
+    return priority - PRIORITY_DEPTH_PENALTY * max(0, depth - 1)
 
 
 #main class
 
 class UniversalSpider(scrapy.Spider):
     name = "universal_scraper"
-    visited_urls = set()
-    category_keywords: List[str] = []
-    irrelevant_url_keywords: List[str] = []
+    # URL keyword matchers built from categories.yml (see keyword_matcher.py)
+    category_matcher = KeywordMatcher({})
+    irrelevant_matcher = KeywordMatcher({})
     sites_to_crawl: List[Dict[str, str]] = []
 
     # Playwright settings for dynamic content (JavaScript)
@@ -76,7 +124,12 @@ class UniversalSpider(scrapy.Spider):
         "playwright_page_goto_kwargs": {"timeout": 60000, "wait_until": "domcontentloaded"},
     }
 
-    def __init__(self, start_url=None, *args, **kwargs):
+    def __init__(self, start_url=None, domains=None, sites=None, *args, **kwargs):
+        """
+        start_url: crawl a single source (subprocess mode).
+        domains: comma-separated list (or list) of domains to crawl in this process.
+        sites: site rows already loaded by the runner, skips the database query.
+        """
         super().__init__(*args, **kwargs)
 
         # 1. Load Keywords from YAML
@@ -84,23 +137,45 @@ class UniversalSpider(scrapy.Spider):
             yaml_data = get_data('news_crawler', 'general_category_keywords/categories.yml')
             if yaml_data:
                 config = yaml.safe_load(yaml_data)
-                self.category_keywords = [kw.lower() for cat in config.get('categories', {}).values() for kw in
-                                          cat.get('keywords', [])]
-                self.category_keywords.extend([kw.lower() for kw in config.get('general_category_keywords', [])])
-                self.irrelevant_url_keywords = [kw.lower() for kw in config.get('irrelevant_keywords', [])]
+                self.category_matcher = KeywordMatcher.from_categories(config)
+                self.irrelevant_matcher = KeywordMatcher.from_keywords(config.get('irrelevant_keywords', []))
         except Exception:
             pass
 
         # 2. Retrieve active sources from the database
-        sites_data = db.get_active_sites()
+        sites_data = sites if sites is not None else db.get_active_sites()
         if start_url:
             self.sites_to_crawl = [s for s in sites_data if s.get('start_url').strip() == start_url.strip()]
+        elif domains:
+            wanted = set(domains.split(',') if isinstance(domains, str) else domains)
+            self.sites_to_crawl = [s for s in sites_data if s.get('domain') in wanted]
         else:
             self.sites_to_crawl = sites_data
 
     def start_requests(self):
         """Starts the crawling process."""
         os.makedirs('results', exist_ok=True)
+        self.output_suffix = record_io.output_suffix(self.settings.get('OUTPUT_FORMAT', 'jsonl'))
+
+        # Decides per domain between plain HTTP and Playwright rendering (see RENDER_MODE)
+        self.render_policy = RenderPolicy.from_settings(self.settings)
+        # Replaces the in-memory visited set; remembers fetched URLs across runs (see FRONTIER_*)
+        self.frontier = URLFrontier.from_settings(self.settings)
+        self.deprioritized_priority = self.settings.getint('FRONTIER_DEPRIORITIZED_PRIORITY', -10)
+        # Pre-fetch article scorer for listing links (see URL_PREFILTER_*); None when disabled or untrained
+        self.url_prefilter = URLClassifier.load() if self.settings.getbool('URL_PREFILTER_ENABLED', True) else None
+        if self.url_prefilter is not None:
+            self.url_prefilter_mode = self.settings.get('URL_PREFILTER_MODE', 'skip')
+            if self.url_prefilter_mode not in ("skip", "deprioritize"):
+                raise ValueError(f"Unknown URL_PREFILTER_MODE: {self.url_prefilter_mode}")
+            self.url_prefilter_threshold = self.settings.getfloat('URL_PREFILTER_THRESHOLD') \
+                if self.settings.get('URL_PREFILTER_THRESHOLD') is not None else self.url_prefilter.threshold
+            self.url_prefilter_priority = self.settings.getint('URL_PREFILTER_DEPRIORITIZED_PRIORITY', -5)
+        # Listing hops and per-domain page/time budget (see CRAWL_*)
+        self.max_depth = max(1, self.settings.getint('CRAWL_MAX_DEPTH', 2))
+        self.crawl_budget = CrawlBudget.from_settings(self.settings)
+        # trafilatura + cleanup off the reactor thread (see EXTRACTION_*)
+        self.extraction = ExtractionPool.from_settings(self.settings)
 
         # Calculate Allowed Domains for the offsite middleware
         allowed = set()
@@ -108,52 +183,291 @@ class UniversalSpider(scrapy.Spider):
             netloc = urlparse(s.get('start_url')).netloc.lower().replace('www.', '')
             if netloc: allowed.add(netloc)
         self.allowed_domains = list(allowed) + [f"www.{d}" for d in allowed]
+        self.site_netlocs = frozenset(allowed)
+
+        # Sitemap / feed discovery before homepage link extraction (see DISCOVERY_*)
+        self.discovery_mode = self.settings.get('DISCOVERY_MODE', 'auto')
+        self.discovery_state: Dict[str, Dict[str, Any]] = {}
 
         for site in self.sites_to_crawl:
             domain = site.get("domain")
-            filename = f"results/raw_{domain.replace('.', '_')}.json"
+            filename = self.output_filename(domain)
+
+            # Stats of a previous run must not be mistaken for this run's (see crawl_stats)
+            crawl_stats.clear_stats(crawl_stats.stats_path_for(filename))
+
+            if self.discovery_mode == "homepage":
+                request = self.homepage_request(site)
+            else:
+                # last_visited as loaded, i.e. the previous crawl (update_last_visited below only touches the DB)
+                self.discovery_state[domain] = {"site": site, "since": site.get("last_visited"), "pending": 0,
+                                                "entries": 0, "scheduled": 0, "sitemaps": 0,
+                                                "requested": set()}
+                root = f"{urlparse(site.get('start_url')).scheme}://{urlparse(site.get('start_url')).netloc}"
+                request = self.discovery_request(f"{root}/robots.txt", self.site_meta(site), self.parse_robots)
 
             # Update DB for the visit
             db.update_last_visited(domain)
-
-            yield scrapy.Request(url=site.get("start_url"),
-                                 meta={**self.playwright_meta, "depth": 0, "filename": filename, "site_domain": domain},
-                                 callback=self.parse_links)
+            self.crawler.stats.set_value(f"domain/{domain}/started_at", time.time())
+            self.crawl_budget.start(domain)
+            yield request
+
+    def site_meta(self, site):
+        domain = site.get("domain")
+        return {"filename": self.output_filename(domain), "site_domain": domain, "site_id": site.get("id")}
+
+    def homepage_request(self, site):
+        return scrapy.Request(url=site.get("start_url"),
+                              meta={**self.fetch_meta(site.get("domain")), "crawl_depth": 0, **self.site_meta(site)},
+                              callback=self.parse_links)
+
+    def output_filename(self, domain):
+        # suffix selects the record format written by CustomJsonPipeline (see OUTPUT_FORMAT)
+        return f"results/raw_{domain.replace('.', '_')}{self.output_suffix}"
+
+    def fetch_meta(self, domain):
+        """Playwright meta for domains that need rendering, empty for plain HTTP fetching."""
+        return dict(self.playwright_meta) if self.render_policy.use_browser(domain) else {}
+
+    def escalate_to_browser(self, response, probe_size):
+        """Re-queues an HTTP-fetched response through Playwright."""
+        self.crawler.stats.inc_value("render/escalated")
+        self.crawler.stats.inc_value(f"domain/{response.meta.get('site_domain')}/render_escalated")
+        self.logger.debug(f"Escalating to Playwright: {response.url}")
+        # the conditional-cache validators and hit flag belong to the HTTP fetch: sent by Chromium
+        # they would get a bodyless 304, and the hit flag would skip extraction of the render
+        headers = response.request.headers.copy()
+        for name in ("If-None-Match", "If-Modified-Since"):
+            headers.pop(name, None)
+        meta = {k: v for k, v in response.meta.items() if k not in ("http_cache_hit", "http_cache_entry")}
+        return response.request.replace(
+            headers=headers,
+            meta={**meta, **self.playwright_meta, "render_probe_size": probe_size},
+            dont_filter=True)
+
+    def closed(self, reason):
+        if hasattr(self, "extraction"):
+            report = self.extraction.report()
+            for key, value in report.items():
+                self.crawler.stats.set_value(f"extraction/{key}", value)
+            self.logger.info(f"Extraction pool: {report}")
+            self.extraction.shutdown()
+        if hasattr(self, "frontier"):
+            self.frontier.save()
+        if hasattr(self, "render_policy"):
+            self.render_policy.save_cache()
+            decisions = {d: s["decision"] for d, s in self.render_policy.domains.items()}
+            self.logger.info(f"Render decisions per domain: {decisions}")
+        self.write_crawl_stats(reason)
+
+    def write_crawl_stats(self, reason):
+        """Publishes the per-domain crawl counters for the runner (see crawl_stats)."""
+        all_stats = self.crawler.stats.get_stats()
+        finished_at = time.time()
+        for site in self.sites_to_crawl:
+            domain = site.get("domain")
+            prefix = f"domain/{domain}/"
+            counters = {k[len(prefix):]: v for k, v in all_stats.items() if k.startswith(prefix)}
+            started_at = counters.get("started_at", finished_at)
+            crawl_section = {
+                "pages": counters.get("pages", 0),
+                "links_scheduled": counters.get("links_scheduled", 0),
+                "render_escalated": counters.get("render_escalated", 0),
+                "frontier_skipped": counters.get("frontier_skipped", 0),
+                "url_prefilter_skipped": counters.get("url_prefilter_skipped", 0),
+                "listings_expanded": counters.get("listings_expanded", 0),
+                "budget_dropped": counters.get("budget_dropped", 0),
+                "discovered": counters.get("discovered", 0),
+                "discovery_fallback": bool(counters.get("discovery_fallback")),
+                "finish_reason": reason,
+                "timings": {
+                    "crawl": round(counters.get("last_item_at", finished_at) - started_at, 3),
+                    "extraction": round(counters.get("extract_seconds", 0.0), 3),
+                },
+            }
+            try:
+                crawl_stats.write_stats_section(crawl_stats.stats_path_for(self.output_filename(domain)),
+                                                "crawl", crawl_section)
+            except Exception as e:
+                self.logger.error(f"Could not write crawl stats for {domain}: {e}")
 
     def parse_links(self, response):
         #lnk extraction and noise filtering.
-        if response.meta.get("depth", 0) >= 1: return
-
-        # Targeted selectors for news articles
-        link_selectors = ['main a[href]', 'article a[href]', 'a[href*="/article"]', 'a[href*="/story"]',
-                          'a[href*="/news"]']
-        link_elements = response.css(', '.join(link_selectors)) or response.css('a')
-
-        self.logger.info(f"Found {len(link_elements)} links on    {response.url}")
-
-        seen = set()
-        for link_el in link_elements:
-            href = link_el.css('::attr(href)').get()
-            if not href or href in seen or href.startswith(("javascript", "mailto", "#")): continue
+        # crawl_depth counts listing hops; Scrapy's own "depth" also counts robots/sitemap requests
+        depth = response.meta.get("crawl_depth", 0)
+        if depth >= self.max_depth: return
+        site_domain = response.meta.get("site_domain")
+        rendered = bool(response.meta.get("playwright"))
+        if self.crawl_budget.exhausted(site_domain): return
+
+        links = extract_links(response.selector.root, sections=depth + 1 < self.max_depth)
+
+        self.logger.info(f"Found {len(links)} links on    {response.url}")
+
+        # only homepages are probed here; category pages went through parse_page's own probe
+        if depth == 0 and not rendered and \
+                self.render_policy.should_escalate_listing(site_domain, response.text, len(links)):
+            yield self.escalate_to_browser(response, len(links))
+            return
+
+        seen, candidates = set(), []
+        for href, link_el in links:
+            if href in seen or href.startswith(("javascript", "mailto", "#")): continue
             seen.add(href)
-            full_url = urljoin(response.url, href).split('#')[0].split('?')[0].rstrip('/')
-
-            # Domain check
-            if urlparse(full_url).netloc.lower().replace('www.', '') not in [d.replace('www.', '') for d in
-                                                                             self.allowed_domains]: continue
-            if full_url in self.visited_urls: continue
-            self.visited_urls.add(full_url)
-
-            # Filtering irrelevant URLs
-            if any(kw in full_url.lower() for kw in self.irrelevant_url_keywords): continue
-
-            is_category = any(kw in full_url.lower() for kw in self.category_keywords)
-            source_xpath = Selector(text=link_el.get()).xpath('//a/@href').get()
-
-            yield scrapy.Request(full_url,
-                                 meta={**self.playwright_meta, "depth": 1, "filename": response.meta.get("filename"),
-                                       "is_category_link": is_category, "source_xpath": source_xpath,
-                                       "site_domain": response.meta.get("site_domain")}, callback=self.parse_page)
+            candidates.append((urljoin(response.url, href), link_el))
+
+        scores = self.score_links([url for url, _ in candidates])
+        for (url, link_el), score in zip(candidates, scores):
+            request = self.schedule_link(url, response.meta, link_el, url_score=score)
+            if request is not None:
+                yield request
+
+    def score_links(self, urls):
+        """Article probability of every link of a listing page in one model call, None without a model."""
+        if self.url_prefilter is None or not urls:
+            return [None] * len(urls)
+        started = time.perf_counter()
+        scores = self.url_prefilter.score(urls, self.category_matcher)
+        self.crawler.stats.inc_value("url_prefilter/seconds", time.perf_counter() - started)
+        self.crawler.stats.inc_value("url_prefilter/scored", len(urls))
+        return scores.tolist()
+
+    def schedule_link(self, url, meta, link_el=None, url_score=None):
+        """
+        Page request for a discovered link, or None if it is filtered out (other domain, already
+        scheduled, irrelevant, fetched recently, unlikely to be an article, or over budget).
+        Category pages above CRAWL_MAX_DEPTH are requested as listings whose links are followed too.
+        """
+        site_domain = meta.get("site_domain")
+        full_url = url.split('#')[0].split('?')[0].rstrip('/')
+        depth = meta.get("crawl_depth", 0) + 1
+        if self.crawl_budget.exhausted(site_domain): return None
+
+        # Domain check
+        if urlparse(full_url).netloc.lower().replace('www.', '') not in self.site_netlocs: return None
+        fp = url_fingerprint(full_url)
+        frontier = self.frontier.domain(site_domain)
+        if not frontier.schedule(fp): return None
+
+        # Filtering irrelevant URLs
+        url_lower = full_url.lower()
+        if self.irrelevant_matcher.matches(url_lower): return None
+
+        link_category = self.category_matcher.match(url_lower)
+        is_category = link_category is not None
+        unlikely_article = url_score is not None and url_score < self.url_prefilter_threshold
+        # listings change between runs, so they bypass the frontier's recheck TTL and the prefilter
+        expand = depth < self.max_depth and is_section_url(full_url) and (is_category or unlikely_article)
+        # position of the anchor in the listing page (lxml element from extract_links)
+        source_xpath = link_el.getroottree().getpath(link_el) if link_el is not None else None
+        link_text = anchor_text(link_el) if link_el is not None else None
+
+        # Fetched recently in an earlier run: skip, or let everything else go first
+        priority = link_priority(full_url, url_score, depth)
+        if not expand and frontier.is_fresh(fp, self.frontier.recheck_ttl):
+            if self.frontier.mode == "skip":
+                self.crawler.stats.inc_value(f"domain/{site_domain}/frontier_skipped")
+                return None
+            priority = min(priority, self.deprioritized_priority)
+            self.crawler.stats.inc_value(f"domain/{site_domain}/frontier_deprioritized")
+
+        # URL-only model says this is most likely a category or "other" page
+        if unlikely_article and not expand:
+            if self.url_prefilter_mode == "skip":
+                self.crawler.stats.inc_value(f"domain/{site_domain}/url_prefilter_skipped")
+                return None
+            priority = min(priority, self.url_prefilter_priority)
+            self.crawler.stats.inc_value(f"domain/{site_domain}/url_prefilter_deprioritized")
+
+        self.crawler.stats.inc_value(f"domain/{site_domain}/links_scheduled")
+        return scrapy.Request(full_url, priority=priority,
+                              meta={**self.fetch_meta(site_domain), "crawl_depth": depth, "expand_links": expand,
+                                    "filename": meta.get("filename"),
+                                    "is_category_link": is_category, "link_category": link_category,
+                                    "source_xpath": source_xpath, "anchor_text": link_text,
+                                    "site_domain": site_domain, "site_id": meta.get("site_id"),
+                                    "frontier_fp": fp, "url_score": url_score},
+                              callback=self.parse_page)
+
+    def discovery_request(self, url, meta, callback):
+        # Always plain HTTP; dont_filter so every request reaches parse or errback and is accounted for
+        state = self.discovery_state[meta["site_domain"]]
+        state["pending"] += 1
+        state["requested"].add(url)
+        return scrapy.Request(url, callback=callback, errback=self.discovery_failed, dont_filter=True,
+                              meta={"filename": meta.get("filename"), "site_domain": meta.get("site_domain"),
+                                    "site_id": meta.get("site_id")})
+
+    def parse_robots(self, response):
+        sitemaps = discovery.sitemaps_from_robots(response.body.decode('utf-8', 'replace'), response.url)
+        yield from self.follow_robots_sitemaps(response.meta, response.url, sitemaps)
+        yield from self.discovery_done(response.meta["site_domain"])
+
+    def follow_robots_sitemaps(self, meta, robots_url, sitemaps):
+        if not sitemaps:
+            sitemaps = [urljoin(robots_url, path) for path in self.settings.getlist('DISCOVERY_FALLBACK_PATHS')]
+        # news sitemaps first, they list the latest articles
+        sitemaps.sort(key=lambda u: 'news' not in u.lower())
+        yield from self.follow_sitemaps(meta, sitemaps)
+
+    def follow_sitemaps(self, meta, urls):
+        state = self.discovery_state[meta["site_domain"]]
+        max_sitemaps = self.settings.getint('DISCOVERY_MAX_SITEMAPS', 10)
+        for url in urls:
+            if state["sitemaps"] >= max_sitemaps: break
+            if url in state["requested"]: continue
+            state["sitemaps"] += 1
+            yield self.discovery_request(url, meta, self.parse_discovery)
+
+    def parse_discovery(self, response):
+        """Schedules articles listed in a sitemap or feed that are newer than the previous crawl."""
+        site_domain = response.meta["site_domain"]
+        state = self.discovery_state[site_domain]
+        slack = self.settings.getint('DISCOVERY_LASTMOD_SLACK', 3600)
+        max_urls = self.settings.getint('DISCOVERY_MAX_URLS', 300)
+
+        child_sitemaps = []
+        for kind, loc, lastmod in discovery.iter_entries(response.body):
+            state["entries"] += 1
+            if not discovery.is_newer(lastmod, state["since"], slack): continue
+            if kind == discovery.ENTRY_SITEMAP:
+                child_sitemaps.append((lastmod.timestamp() if lastmod else float('inf'), loc))
+            elif state["scheduled"] < max_urls:
+                request = self.schedule_link(loc, response.meta)
+                if request is not None:
+                    state["scheduled"] += 1
+                    self.crawler.stats.inc_value(f"domain/{site_domain}/discovered")
+                    yield request
+
+        # newest child sitemaps first (undated ones before dated)
+        child_sitemaps.sort(reverse=True)
+        yield from self.follow_sitemaps(response.meta, [loc for _, loc in child_sitemaps])
+        yield from self.discovery_done(site_domain)
+
+    def discovery_failed(self, failure):
+        meta = failure.request.meta
+        self.logger.debug(f"Discovery request failed: {failure.request.url} ({failure.value!r})")
+        if failure.request.callback == self.parse_robots:
+            # no robots.txt: still try the usual sitemap/feed locations
+            yield from self.follow_robots_sitemaps(meta, failure.request.url, [])
+        yield from self.discovery_done(meta["site_domain"])
+
+    def discovery_done(self, site_domain):
+        # Once every discovery request of a site has finished: homepage links if it has no sitemap/feed
+        state = self.discovery_state[site_domain]
+        state["pending"] -= 1
+        if state["pending"] == 0:
+            self.logger.info(f"Discovery for {site_domain}: {state['entries']} entries, "
+                             f"{state['scheduled']} scheduled since {state['since']}")
+            if state["entries"] == 0:
+                self.crawler.stats.set_value(f"domain/{site_domain}/discovery_fallback", 1)
+                yield self.homepage_request(state["site"])
+
+    @staticmethod
+    def content_xpath(response):
+        # Structural path of the page's first <article>, the element the training data's xpath column points at
+        article = next(response.selector.root.iter('article'), None)
+        return article.getroottree().getpath(article) if article is not None else None
 
     def clean_text_block(self, paragraphs: List[str]) -> str:
         """Fallback text cleanup if Trafilatura fails."""
@@ -165,36 +479,42 @@ class UniversalSpider(scrapy.Spider):
             cleaned.append(p_strip)
         return "\n\n".join(cleaned)
 
-    def parse_page(self, response):
+    async def parse_page(self, response):
         """Main content and image extraction."""
         url = response.url
 
         # Log at DEBUG level for terminal cleanliness
         self.logger.debug(f" Scraping content from: {url}")
 
-        extracted_data = {}
-        try:
-            extracted_json = trafilatura.extract(response.text, output_format='json', include_comments=False)
-            if extracted_json: extracted_data = json.loads(extracted_json)
-        except Exception:
-            pass
+        # Server answered 304 (see News_crawlerDownloaderMiddleware): optionally nothing to re-extract
+        if response.meta.get("http_cache_hit") and self.settings.getbool("CONDITIONAL_CACHE_SKIP_UNCHANGED"):
+            site_domain = response.meta.get("site_domain")
+            self.crawler.stats.inc_value(f"domain/{site_domain}/unchanged_skipped")
+            self.frontier.domain(site_domain).record_fetch(response.meta.get("frontier_fp") or url_fingerprint(url))
+            return
 
-        #  TEXT CLEANUP
-        article_body = extracted_data.get('text', '')
+        # Extraction and site cleanup rules run in the extraction pool
         normalized_domain = urlparse(url).netloc.replace('www.', '')
-        if normalized_domain in SITE_REGEX_RULES:
-            for pattern in SITE_REGEX_RULES[normalized_domain]:
-                article_body = pattern.sub('', article_body)
-
-        # Remove generic boilerplates
-        article_body = "\n".join([l for l in article_body.split('\n') if
-                                  not any(x in l for x in ['Ακολουθήστε μας', 'Follow us', 'Διαβάστε ακόμη'])]).strip()
+        extracted = await self.extraction.extract(response.text, normalized_domain)
+        extracted_data, article_body = extracted["data"], extracted["body"]
+        self.crawler.stats.inc_value(f"domain/{response.meta.get('site_domain')}/extract_seconds",
+                                     extracted["seconds"])
 
         if not article_body:
             article_body = self.clean_text_block(
                 response.css('article, .post-body, .main-content').xpath('.//text()').getall())
 
         text_length = len(article_body)
+
+        # Hybrid rendering: escalate JavaScript-only pages to Playwright
+        site_domain = response.meta.get("site_domain") or normalized_domain
+        if not response.meta.get("playwright"):
+            if self.render_policy.should_escalate_page(site_domain, response.text, text_length):
+                yield self.escalate_to_browser(response, text_length)
+                return
+        elif "render_probe_size" in response.meta:
+            self.render_policy.record_render(site_domain, response.meta["render_probe_size"], text_length)
+
         title = extracted_data.get('title') or response.css('h1::text, title::text').get()
         title_length = len(title) if title else 0
 
@@ -221,14 +541,28 @@ class UniversalSpider(scrapy.Spider):
             "title": title, "title_length": title_length, "text_length": text_length,
             "text_density": text_length / (article_body.count("\n\n") + 1) if text_length else 0,
             "article_body": article_body, "filename": response.meta.get("filename"),
+            "site_id": response.meta.get("site_id"),
             "is_category_link": response.meta.get("is_category_link", False),
+            "link_category": response.meta.get("link_category"),
             "is_article_in_category": is_article_in_category,
             "source_xpath": response.meta.get("source_xpath"),
-            "xpath": extracted_data.get('xpath') or None,
+            "anchor_text": response.meta.get("anchor_text"),
+            "xpath": extracted_data.get('xpath') or self.content_xpath(response),
             "has_date_pattern_in_url": bool(re.search(r"/\d{4}/\d{2}/\d{2}/", url)),
             "image_urls": [main_image] if main_image else [],
             "has_trafilatura_meta": bool(extracted_data.get('date') and extracted_data.get('author'))
         })
 
+        # keyed by the scheduled URL, so redirects do not defeat the next run's lookup
+        self.frontier.domain(site_domain).record_fetch(response.meta.get("frontier_fp") or url_fingerprint(url))
+
+        # Per-domain counters keep shared multi-site crawls reportable per source
+        self.crawler.stats.inc_value(f"domain/{site_domain}/pages")
+        self.crawler.stats.set_value(f"domain/{site_domain}/last_item_at", time.time())
+        yield item
 
-        yield item
\ No newline at end of file
+        # Category page below CRAWL_MAX_DEPTH: its links are ranked and followed like the homepage's
+        if response.meta.get("expand_links"):
+            self.crawler.stats.inc_value(f"domain/{site_domain}/listings_expanded")
+            for request in self.parse_links(response):
+                yield request
\ No newline at end of file
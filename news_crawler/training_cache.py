@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import sys
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Parsed training data for scripts/train_classifier.py, cached as one uncompressed .npz of columns
+# (float64 numeric features, fixed-width unicode for url / label / xpath) next to a manifest of
+# the source files. A file whose size or mtime changed is re-hashed; the cache is rebuilt only
+# if a hash differs or files were added or removed, so a touched file costs a hash, not a parse.
+# Only raw inputs are cached: the features themselves are still computed by features.build_features.
+
+try:
+    from .features import REQUIRED_FEATURES, XPATH_FEATURES, as_numeric, xpath_column
+except ImportError:
+    from features import REQUIRED_FEATURES, XPATH_FEATURES, as_numeric, xpath_column
+
+CACHE_VERSION = 1
+NUMERIC_COLUMNS = [f for f in REQUIRED_FEATURES if f not in XPATH_FEATURES]
+TEXT_COLUMNS = ["url", "label"]
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def data_files(data_dir: str) -> List[str]:
+    return sorted(
+        os.path.join(data_dir, f) for f in os.listdir(data_dir)
+        if f.endswith('.json') and os.path.isfile(os.path.join(data_dir, f))
+    )
+
+
+class TrainingCache:
+    def __init__(self, data_dir: str, cache_dir: str):
+        self.data_dir = data_dir
+        self.cache_dir = cache_dir
+        self.columns_path = os.path.join(cache_dir, "training_data.npz")
+        self.manifest_path = os.path.join(cache_dir, "training_data.json")
+
+    def _manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return manifest if manifest.get("version") == CACHE_VERSION else {}
+
+    def _sources(self, files: List[str], previous: Dict) -> Dict[str, Dict]:
+        sources = {}
+        for path in files:
+            st = os.stat(path)
+            name = os.path.basename(path)
+            known = previous.get(name)
+            if known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+                sources[name] = known
+            else:
+                sources[name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": file_hash(path)}
+        return sources
+
+    def load(self, rebuild: bool = False) -> pd.DataFrame:
+        """Labeled rows of every data file; parsed from JSON only when the sources changed (or rebuild)."""
+        files = data_files(self.data_dir)
+        manifest = self._manifest()
+        previous = manifest.get("sources", {})
+        sources = self._sources(files, previous)
+        fresh = (not rebuild and os.path.exists(self.columns_path)
+                 and {n: s["sha1"] for n, s in sources.items()} == {n: s["sha1"] for n, s in previous.items()})
+        if fresh:
+            df = self._read(manifest)
+            if sources != previous:
+                self._write_manifest(sources, manifest["xpath_column"], manifest["rows"])   # touched only
+            print(f"loaded {len(df)} cached rows from {len(files)} datasets")
+            return df
+
+        print(f"parsing {len(files)} datasets for training")
+        df = self._parse(files)
+        self._write(df, sources)
+        return df
+
+    def _parse(self, files: List[str]) -> pd.DataFrame:
+        records = []
+        for path in files:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    records.extend(json.load(f))
+            except json.JSONDecodeError:
+                print(f"Skipping {os.path.basename(path)}: Invalid JSON format.")
+            except Exception as e:
+                print(f"Skipping {os.path.basename(path)}: {str(e)}")
+        raw = pd.DataFrame(records)
+        if "label" not in raw.columns:
+            return raw
+        raw = raw[raw["label"].notnull()].reset_index(drop=True)
+
+        df = pd.DataFrame(index=raw.index)
+        for name in TEXT_COLUMNS:
+            df[name] = raw[name].where(raw[name].map(type) == str, "") if name in raw.columns else ""
+        path_column = xpath_column(raw)
+        # a missing path is stored as "", which build_features scores like no path at all
+        paths = raw[path_column] if path_column in raw.columns else pd.Series("", index=raw.index)
+        df[path_column] = paths.where(paths.map(type) == str, "")
+        for name in NUMERIC_COLUMNS:
+            if name in raw.columns:
+                df[name] = as_numeric(raw[name])
+        return df
+
+    def _write(self, df: pd.DataFrame, sources: Dict):
+        if "label" not in df.columns:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        columns = {}
+        for name in df.columns:
+            values = df[name].to_numpy()
+            columns[name] = values.astype(str) if values.dtype == object else values.astype(np.float64)
+        tmp = self.columns_path + ".tmp.npz"
+        np.savez(tmp, **columns)
+        os.replace(tmp, self.columns_path)
+        self._write_manifest(sources, xpath_column(df), len(df))
+
+    def _write_manifest(self, sources: Dict, path_column: str, rows: int):
+        manifest = {"version": CACHE_VERSION, "rows": rows, "xpath_column": path_column, "sources": sources}
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+    def _read(self, manifest: Dict) -> pd.DataFrame:
+        with np.load(self.columns_path, allow_pickle=False) as columns:
+            df = pd.DataFrame({name: columns[name] for name in columns.files})
+        for name in df.columns:
+            if df[name].dtype.kind == "U":
+                df[name] = df[name].astype(object)
+        if len(df) != manifest["rows"]:
+            sys.stderr.write(f"Warning: {self.columns_path} holds {len(df)} rows, manifest says {manifest['rows']}\n")
+        return df
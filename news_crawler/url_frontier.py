@@ -0,0 +1,137 @@
+import hashlib
+import os
+import sys
+import time
+from typing import Dict, Set
+
+import numpy as np
+
+# Persistent per-domain record of fetched URLs, one file per domain (cache/frontier/<domain>.npy).
+# Each entry is a 64-bit URL fingerprint and the time the URL was last fetched, kept sorted by
+# fingerprint so lookups are a binary search over a memory-mapped array.
+
+ENTRY_DTYPE = np.dtype([('fp', '<u8'), ('ts', '<u4')])
+
+
+def url_fingerprint(url: str) -> int:
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class DomainFrontier:
+    """
+    Fetch history of one domain: the stored array (memory-mapped, read-only) plus the
+    fingerprints scheduled and fetched during this run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.stored = self._load()
+        self.scheduled: Set[int] = set()
+        self.fetched: Dict[int, int] = {}
+
+    def _load(self):
+        if not self.path:
+            return np.empty(0, dtype=ENTRY_DTYPE)
+        try:
+            stored = np.load(self.path, mmap_mode='r')
+            if stored.dtype == ENTRY_DTYPE:
+                return stored
+            sys.stderr.write(f"Warning: ignoring frontier file with unexpected layout: {self.path}\n")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            sys.stderr.write(f"Warning: unreadable frontier file {self.path}: {e}\n")
+        return np.empty(0, dtype=ENTRY_DTYPE)
+
+    def schedule(self, fp: int) -> bool:
+        """False if the URL was already scheduled in this run."""
+        if fp in self.scheduled:
+            return False
+        self.scheduled.add(fp)
+        return True
+
+    def last_fetched(self, fp: int) -> int:
+        if fp in self.fetched:
+            return self.fetched[fp]
+        fps = self.stored['fp']
+        i = np.searchsorted(fps, np.uint64(fp))
+        if i < len(fps) and fps[i] == fp:
+            return int(self.stored['ts'][i])
+        return 0
+
+    def is_fresh(self, fp: int, ttl: int, now: float = None) -> bool:
+        """True if the URL was fetched less than ttl seconds ago (in an earlier run or this one)."""
+        fetched_at = self.last_fetched(fp)
+        return bool(fetched_at) and (now or time.time()) - fetched_at < ttl
+
+    def record_fetch(self, fp: int, now: float = None):
+        self.fetched[fp] = int(now or time.time())
+
+    def save(self, retention: int):
+        """Merges this run's fetches into the stored array and drops entries older than retention seconds."""
+        if not self.path or not self.fetched:
+            return
+        run = np.empty(len(self.fetched), dtype=ENTRY_DTYPE)
+        run['fp'] = np.fromiter(self.fetched.keys(), dtype='<u8', count=len(self.fetched))
+        run['ts'] = np.fromiter(self.fetched.values(), dtype='<u4', count=len(self.fetched))
+
+        merged = np.concatenate([np.asarray(self.stored), run])
+        if retention:
+            merged = merged[merged['ts'] >= max(0, int(time.time()) - retention)]
+        # newest timestamp first within each fingerprint, then keep the first of each run
+        merged = merged[np.lexsort((-merged['ts'].astype(np.int64), merged['fp']))]
+        keep = np.ones(len(merged), dtype=bool)
+        keep[1:] = merged['fp'][1:] != merged['fp'][:-1]
+        merged = merged[keep]
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, merged)
+        os.replace(tmp_path, self.path)
+        self.stored = np.load(self.path, mmap_mode='r')
+        self.fetched = {}
+
+
+class URLFrontier:
+    """
+    Cross-run URL frontier used by the spider. URLs fetched within recheck_ttl seconds are
+    skipped (mode "skip") or scheduled at a lower priority (mode "deprioritize").
+    Without persistence it only deduplicates URLs within the run.
+    """
+
+    def __init__(self, directory: str = "cache/frontier", recheck_ttl: int = 21600, mode: str = "skip",
+                 retention: int = 30 * 86400, persistent: bool = True):
+        if mode not in ("skip", "deprioritize"):
+            raise ValueError(f"Unknown FRONTIER_MODE: {mode}")
+        self.directory = directory
+        self.recheck_ttl = recheck_ttl
+        self.mode = mode
+        self.retention = retention
+        self.persistent = persistent
+        self.domains: Dict[str, DomainFrontier] = {}
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            directory=settings.get('FRONTIER_DIR', 'cache/frontier'),
+            recheck_ttl=settings.getint('FRONTIER_RECHECK_TTL', 21600),
+            mode=settings.get('FRONTIER_MODE', 'skip'),
+            retention=settings.getint('FRONTIER_RETENTION_DAYS', 30) * 86400,
+            persistent=settings.getbool('FRONTIER_ENABLED', True),
+        )
+
+    def domain(self, domain: str) -> DomainFrontier:
+        if domain not in self.domains:
+            path = os.path.join(self.directory, f"{domain.replace('.', '_')}.npy") if self.persistent else None
+            self.domains[domain] = DomainFrontier(path)
+        return self.domains[domain]
+
+    def stored_entries(self) -> int:
+        return sum(len(d.stored) for d in self.domains.values())
+
+    def save(self):
+        for frontier in self.domains.values():
+            try:
+                frontier.save(self.retention)
+            except Exception as e:
+                sys.stderr.write(f"Warning: could not save frontier {frontier.path}: {e}\n")
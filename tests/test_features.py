@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from news_crawler.classifier import MODELS_DIR, LinkClassifier
+from news_crawler.features import (
+    STORE_DIR, XPATH_FEATURES, as_numeric, build_features, legacy_features, load_records, mismatches,
+)
+
+# Training/serving parity on the labeled store (python news_crawler/features.py parity runs the same
+# checks by hand): scripts/train_classifier.py builds features from stored records, while the crawl
+# classifies item dicts that carry no precomputed xpath features.
+
+
+@pytest.fixture(scope="module")
+def records():
+    if not os.path.isdir(STORE_DIR):
+        pytest.skip(f"no dataset store at {STORE_DIR}")
+    return load_records(STORE_DIR)
+
+
+def crawl_item(record):
+    """A labeled record as PageItem yields it: xpath features are left to the classifier."""
+    item = {k: v for k, v in record.items() if k not in XPATH_FEATURES and k != "label"}
+    item.update({"url": "https://example.com/a/b", "title": "t" * record.get("title_length", 0),
+                 "article_body": "", "image_urls": [], "filename": "example.jsonl"})
+    item.setdefault("source_xpath", None)
+    return item
+
+
+def test_vectorized_features_match_row_wise(records):
+    assert mismatches(build_features(pd.DataFrame(records)), legacy_features(records)) == {}
+
+
+def test_recomputed_xpath_features_match_stored(records):
+    df = pd.DataFrame(records)
+    stored = [c for c in XPATH_FEATURES if c in df.columns]
+    assert stored
+    assert mismatches(build_features(df)[stored], df[stored].apply(as_numeric)) == {}
+
+
+def test_missing_and_empty_values_match_row_wise():
+    items = [
+        {},
+        {"xpath": None, "text_density": None, "title_length": "None"},
+        {"xpath": "", "source_xpath": "/html/body/main/article", "has_date_pattern_in_url": "True"},
+        {"source_xpath": 3, "url_length": "12", "is_article_in_category": "false"},
+    ]
+    assert mismatches(build_features(items), legacy_features(items)) == {}
+
+
+def test_in_crawl_items_are_classified_like_training_rows(records):
+    pickles = [os.path.join(MODELS_DIR, f) for f in ("link_classifier.pkl", "label_encoder.pkl")]
+    if not all(os.path.exists(p) for p in pickles):
+        pytest.skip("no trained page classifier")
+    import joblib
+    model, encoder = (joblib.load(p) for p in pickles)
+
+    expected = encoder.inverse_transform(model.predict(legacy_features(records)))
+    served = LinkClassifier.load().predict_records([crawl_item(r) for r in records])
+    assert np.array_equal(np.asarray(served, dtype=object), np.asarray(expected, dtype=object))